@@ -1,21 +1,27 @@
+import time
+
+# Referencia para medir el tiempo de importación y el tiempo hasta estar listo
+PROCESS_START = time.perf_counter()
+
 import os
+import io
 import sys
+import csv
 import json
-import time
+import mmap
+import zlib
+import struct
+import hashlib
 import threading
 import ssl
-from datetime import datetime, timezone, timedelta
+from collections import deque
+from datetime import date, datetime, timezone, timedelta
 from pathlib import Path
 
-import openai
-import paho.mqtt.client as mqtt
-from flask import Flask, jsonify, send_from_directory, send_file, request
+from flask import Flask, Blueprint, Response, jsonify, send_from_directory, send_file, request, stream_with_context
 from flask_cors import CORS
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO
 from dotenv import load_dotenv
-import mysql.connector
-from mysql.connector import Error
-from pywebpush import webpush, WebPushException
 
 # Cargar variables de entorno
 BASE_DIR = Path(__file__).resolve().parent
@@ -32,11 +38,16 @@ DB_CONFIG = {
     'database': os.getenv('DB_NAME', 'iot_clima')
 }
 
+# Reintentos de la inicialización de la base de datos (espera máxima entre intentos, en segundos)
+DB_INIT_RETRY_MAX = float(os.getenv('DB_INIT_RETRY_MAX', 60))
+
 # MQTT
 MQTT_HOST = os.getenv('MQTT_HOST', 'broker.emqx.io')
 MQTT_PORT = int(os.getenv('MQTT_PORT', 8084))
 MQTT_USER = os.getenv('MQTT_USER')
 MQTT_PASSWORD = os.getenv('MQTT_PASSWORD')
+# Espera máxima entre reintentos de conexión al broker (segundos)
+MQTT_RECONNECT_MAX = int(os.getenv('MQTT_RECONNECT_MAX', 60))
 
 # Web Push VAPID
 VAPID_PUBLIC_KEY = os.getenv('VAPID_PUBLIC_KEY', '')
@@ -48,52 +59,198 @@ push_subscriptions = {}
 
 # Sensores
 SENSORS = [
-    {'id': 'tempChart',  'label': 'Temperatura',   'unit': '°C',  'topic': 'clima/temperatura'},
-    {'id': 'presChart',  'label': 'Presión',       'unit': 'hPa', 'topic': 'clima/presion'},
-    {'id': 'humChart',   'label': 'Humedad',       'unit': '%',   'topic': 'clima/humedad'},
-    {'id': 'soilChart',  'label': 'Humedad suelo', 'unit': '%',   'topic': 'clima/humedad_suelo'},
-    {'id': 'lightChart', 'label': 'Luz',           'unit': 'lux', 'topic': 'clima/lux'},
-    {'id': 'vibrChart',  'label': 'Vibración',     'unit': 'Hz',  'topic': 'clima/vibracion'}
+    {'id': 'tempChart',  'label': 'Temperatura',   'unit': '°C',  'topic': 'clima/temperatura',   'column': 'temperatura',   'range': (-40, 85)},
+    {'id': 'presChart',  'label': 'Presión',       'unit': 'hPa', 'topic': 'clima/presion',       'column': 'presion',       'range': (300, 1100)},
+    {'id': 'humChart',   'label': 'Humedad',       'unit': '%',   'topic': 'clima/humedad',       'column': 'humedad',       'range': (0, 100)},
+    {'id': 'soilChart',  'label': 'Humedad suelo', 'unit': '%',   'topic': 'clima/humedad_suelo', 'column': 'humedad_suelo', 'range': (0, 100)},
+    {'id': 'lightChart', 'label': 'Luz',           'unit': 'lux', 'topic': 'clima/lux',           'column': 'luz',           'range': (0, 120000), 'stuck_samples': None},
+    {'id': 'vibrChart',  'label': 'Vibración',     'unit': 'Hz',  'topic': 'clima/vibracion',     'column': 'vibracion',     'range': (0, 1000),   'stuck_samples': None}
 ]
 
+# Almacenamiento de lecturas: 'wide' (una fila por flush en sensor_readings) o
+# 'long' (una fila por sensor y muestra en sensor_samples). Para 'long' se puede
+# elegir FLOAT o DOUBLE y ROW_FORMAT=COMPRESSED
+STORAGE_LAYOUT = os.getenv('STORAGE_LAYOUT', 'wide')
+SAMPLES_VALUE_TYPE = os.getenv('SAMPLES_VALUE_TYPE', 'FLOAT')
+SAMPLES_COMPRESSED = os.getenv('SAMPLES_COMPRESSED', 'false').lower() in ('1', 'true', 'yes')
+MIGRATION_BATCH_ROWS = int(os.getenv('MIGRATION_BATCH_ROWS', 10000))
+
+# Exportación masiva: filas por lote leídas del cursor y caché de archivos
+# generados para reanudar descargas con Range (generaciones simultáneas y
+# cuota en disco; cada archivo tampoco puede superar la cuota)
+EXPORT_BATCH_ROWS = int(os.getenv('EXPORT_BATCH_ROWS', 5000))
+EXPORT_DIR = Path(os.getenv('EXPORT_DIR', BASE_DIR / 'exports'))
+EXPORT_CACHE_HOURS = float(os.getenv('EXPORT_CACHE_HOURS', 24))
+EXPORT_MAX_BUILDS = int(os.getenv('EXPORT_MAX_BUILDS', 2))
+EXPORT_MAX_BYTES = int(os.getenv('EXPORT_MAX_BYTES', 1024 * 1024 * 1024))
+
+# Spool local (write-ahead) de lecturas: tamaño de segmento, límite total en
+# disco y lote / intervalo del replayer que las carga en MySQL
+SPOOL_DIR = Path(os.getenv('SPOOL_DIR', BASE_DIR / 'spool'))
+SPOOL_SEGMENT_BYTES = int(os.getenv('SPOOL_SEGMENT_BYTES', 4 * 1024 * 1024))
+SPOOL_MAX_BYTES = int(os.getenv('SPOOL_MAX_BYTES', 256 * 1024 * 1024))
+SPOOL_REPLAY_BATCH = int(os.getenv('SPOOL_REPLAY_BATCH', 1000))
+SPOOL_REPLAY_INTERVAL = float(os.getenv('SPOOL_REPLAY_INTERVAL', 5))
+
+# Salud de sensores: segundos sin datos para considerar un hueco / sensor inactivo
+# y número de lecturas idénticas consecutivas para considerar un valor atascado.
+# Un sensor puede definir su propio 'stuck_samples' en SENSORS, o None para no
+# detectar valores atascados (luz de noche y vibración en reposo se repiten)
+SENSOR_GAP_SECONDS = float(os.getenv('SENSOR_GAP_SECONDS', 60))
+SENSOR_STUCK_SAMPLES = int(os.getenv('SENSOR_STUCK_SAMPLES', 30))
+
+# ==================== IMPORTACIONES DIFERIDAS ====================
+# openai, pywebpush, mysql.connector y paho son costosos de importar; se cargan
+# en el primer uso para que el arranque del proceso sea rápido.
+
+def _mysql():
+    import mysql.connector
+    return mysql.connector
+
+def _mqtt():
+    import paho.mqtt.client as mqtt
+    return mqtt
+
+def _openai():
+    import openai
+    return openai
+
+def _pywebpush():
+    import pywebpush
+    return pywebpush
+
+def _pyarrow():
+    # Dependencia opcional, solo para exportar en Parquet/Arrow
+    import pyarrow
+    import pyarrow.parquet
+    return pyarrow
+
+# ==================== ESTADO DE SUBSISTEMAS ====================
+
+SUBSYSTEMS = ('database', 'mqtt', 'scheduler', 'spool')
+
+subsystem_status = {
+    name: {'status': 'pending', 'detail': None, 'since': None}
+    for name in SUBSYSTEMS
+}
+_status_lock = threading.Lock()
+
+# Segundos desde el inicio del proceso hasta que todos los subsistemas están listos
+time_to_ready = None
+
+def set_subsystem_status(name: str, status: str, detail: str | None = None):
+    """Actualiza el estado de un subsistema (pending | starting | ready | degraded | error)"""
+    global time_to_ready
+    with _status_lock:
+        subsystem_status[name] = {'status': status, 'detail': detail, 'since': time.time()}
+        if time_to_ready is None and all(s['status'] == 'ready' for s in subsystem_status.values()):
+            time_to_ready = time.perf_counter() - PROCESS_START
+            print(f"✅ Todos los subsistemas listos en {time_to_ready:.2f}s")
+
+def is_ready() -> bool:
+    with _status_lock:
+        return all(s['status'] == 'ready' for s in subsystem_status.values())
+
 # ==================== FLASK APP ====================
 
-app = Flask(__name__)
-CORS(app)
-socketio = SocketIO(app, cors_allowed_origins="*", async_mode='threading')
+bp = Blueprint('main', __name__)
+socketio = SocketIO()
+
+def create_app() -> Flask:
+    """Crea la aplicación Flask sin iniciar subsistemas (ver init_subsystems)"""
+    validate_storage_config()
+    app = Flask(__name__)
+    CORS(app)
+    app.register_blueprint(bp)
+    socketio.init_app(app, cors_allowed_origins="*", async_mode='threading')
+    return app
 
 # ==================== DATABASE ====================
 
 def get_connection():
     try:
-        conn = mysql.connector.connect(**DB_CONFIG)
+        conn = _mysql().connect(**DB_CONFIG)
         return conn
-    except Error as e:
+    except _mysql().Error as e:
         print(f"Error conectando a MySQL: {e}")
         return None
 
-def init_database():
+# Layout activo y mapa columna -> sensor_id de la tabla sensors (layout 'long')
+storage_layout = STORAGE_LAYOUT
+sensor_ids = {}
+
+# Serializa la carga de lecturas (replayer) y la consolidación de días cerrados
+_readings_lock = threading.Lock()
+
+def validate_storage_config():
+    """Valida STORAGE_LAYOUT y SAMPLES_VALUE_TYPE antes de arrancar los subsistemas"""
+    if STORAGE_LAYOUT not in ('wide', 'long'):
+        raise ValueError(f"STORAGE_LAYOUT no soportado: {STORAGE_LAYOUT} (usa wide o long)")
+    if SAMPLES_VALUE_TYPE.upper() not in ('FLOAT', 'DOUBLE'):
+        raise ValueError(f"SAMPLES_VALUE_TYPE no soportado: {SAMPLES_VALUE_TYPE} (usa FLOAT o DOUBLE)")
+
+def sensor_readings_ddl(table: str = 'sensor_readings') -> str:
+    return f'''
+        CREATE TABLE IF NOT EXISTS {table} (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            timestamp DATETIME NOT NULL,
+            temperatura DECIMAL(5,2),
+            presion DECIMAL(7,2),
+            humedad DECIMAL(5,2),
+            humedad_suelo DECIMAL(5,2),
+            luz DECIMAL(10,2),
+            vibracion DECIMAL(10,2),
+            INDEX idx_timestamp (timestamp)
+        )
+    '''
+
+def sensor_samples_ddl(table: str = 'sensor_samples', value_type: str = SAMPLES_VALUE_TYPE,
+                       compressed: bool = SAMPLES_COMPRESSED) -> str:
+    """Tabla estrecha (sensor_id, ts, value) agrupada físicamente por sensor y tiempo"""
+    if value_type.upper() not in ('FLOAT', 'DOUBLE'):
+        raise ValueError(f"Tipo de valor no soportado: {value_type}")
+    row_format = ' ROW_FORMAT=COMPRESSED KEY_BLOCK_SIZE=8' if compressed else ''
+    return f'''
+        CREATE TABLE IF NOT EXISTS {table} (
+            sensor_id SMALLINT UNSIGNED NOT NULL,
+            ts DATETIME NOT NULL,
+            value {value_type.upper()} NOT NULL,
+            PRIMARY KEY (sensor_id, ts),
+            INDEX idx_ts (ts)
+        ){row_format}
+    '''
+
+def init_database(layout: str | None = None):
+    """Crea las tablas; layout ('wide' | 'long') selecciona dónde se guardan las lecturas"""
+    global storage_layout
+    layout = layout or storage_layout
+    if layout not in ('wide', 'long'):
+        raise ValueError(f"Layout de almacenamiento no soportado: {layout}")
+    
+    set_subsystem_status('database', 'starting')
     try:
         config_without_db = {k: v for k, v in DB_CONFIG.items() if k != 'database'}
-        conn = mysql.connector.connect(**config_without_db)
+        conn = _mysql().connect(**config_without_db)
         cursor = conn.cursor()
         
         cursor.execute(f"CREATE DATABASE IF NOT EXISTS {DB_CONFIG['database']}")
         cursor.execute(f"USE {DB_CONFIG['database']}")
         
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS sensor_readings (
-                id INT AUTO_INCREMENT PRIMARY KEY,
-                timestamp DATETIME NOT NULL,
-                temperatura DECIMAL(5,2),
-                presion DECIMAL(7,2),
-                humedad DECIMAL(5,2),
-                humedad_suelo DECIMAL(5,2),
-                luz DECIMAL(10,2),
-                vibracion DECIMAL(10,2),
-                INDEX idx_timestamp (timestamp)
-            )
-        ''')
+        cursor.execute(sensor_readings_ddl())
+        
+        if layout == 'long':
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS sensors (
+                    sensor_id SMALLINT UNSIGNED AUTO_INCREMENT PRIMARY KEY,
+                    name VARCHAR(32) NOT NULL UNIQUE
+                )
+            ''')
+            cursor.execute(sensor_samples_ddl())
+            # Un sensor nuevo solo necesita una fila en sensors, no un ALTER TABLE
+            cursor.executemany('INSERT IGNORE INTO sensors (name) VALUES (%s)',
+                               [(sensor['column'],) for sensor in SENSORS])
+            cursor.execute('SELECT sensor_id, name FROM sensors')
+            sensor_ids.update({name: sensor_id for sensor_id, name in cursor.fetchall()})
         
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS reports (
@@ -105,40 +262,158 @@ def init_database():
             )
         ''')
         
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS spool_checkpoint (
+                id TINYINT PRIMARY KEY,
+                last_seq BIGINT NOT NULL
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS daily_summaries (
+                fecha DATE PRIMARY KEY,
+                data_hash CHAR(64) NOT NULL,
+                summary JSON NOT NULL,
+                analysis JSON,
+                final BOOLEAN NOT NULL DEFAULT FALSE,
+                updated_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            )
+        ''')
+        
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS period_reports (
+                period_key VARCHAR(64) PRIMARY KEY,
+                data_hash CHAR(64) NOT NULL,
+                full_report JSON NOT NULL,
+                created_at DATETIME DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+            )
+        ''')
+        
         conn.commit()
         cursor.close()
         conn.close()
-        print("✅ Base de datos inicializada correctamente")
+        storage_layout = layout
+        print(f"✅ Base de datos inicializada correctamente (layout {layout})")
+        set_subsystem_status('database', 'ready')
         return True
-    except Error as e:
+    except _mysql().Error as e:
         print(f"Error inicializando base de datos: {e}")
+        set_subsystem_status('database', 'error', str(e))
         return False
 
-def save_sensor_reading(timestamp, readings: dict):
+def readings_table() -> tuple:
+    """(tabla, columna de tiempo) de las lecturas según el layout activo"""
+    if storage_layout == 'long':
+        return 'sensor_samples', 'ts'
+    return 'sensor_readings', 'timestamp'
+
+def get_sensor_ids() -> dict:
+    """Mapa columna -> sensor_id del layout 'long', cargado de la tabla sensors si hace falta.
+
+    Lanza mysql.connector.Error si MySQL no está disponible o falta algún sensor,
+    de modo que los llamadores lo manejan como cualquier otro error de base de datos.
+    """
+    if any(sensor['column'] not in sensor_ids for sensor in SENSORS):
+        conn = _mysql().connect(**DB_CONFIG)
+        try:
+            cursor = conn.cursor()
+            cursor.execute('SELECT sensor_id, name FROM sensors')
+            sensor_ids.update({name: sensor_id for sensor_id, name in cursor.fetchall()})
+            cursor.close()
+        finally:
+            conn.close()
+        missing = [sensor['column'] for sensor in SENSORS if sensor['column'] not in sensor_ids]
+        if missing:
+            raise _mysql().Error(msg=f"Sensores sin sensor_id en la tabla sensors: {', '.join(missing)}")
+    return sensor_ids
+
+def readings_query(columns: list, where: str) -> str:
+    """SELECT de lecturas en formato ancho (timestamp + columnas) para el layout activo.
+
+    `where` puede usar {ts} para referirse a la columna de tiempo; en el layout
+    'long' las muestras se pivotan por ts y se filtra por sensor_id, con lo que
+    cada sensor se lee como un rango de la clave primaria (sensor_id, ts).
+    """
+    table, ts = readings_table()
+    where = where.format(ts=ts)
+    if storage_layout != 'long':
+        return f"SELECT timestamp, {', '.join(columns)} FROM {table} WHERE {where}"
+    ids_by_column = get_sensor_ids()
+    pivot = ', '.join(
+        f"MAX(CASE WHEN sensor_id = {ids_by_column[c]} THEN value END) AS {c}" for c in columns
+    )
+    ids = ', '.join(str(ids_by_column[c]) for c in columns)
+    return f'''
+        SELECT ts AS timestamp, {pivot} FROM {table}
+        WHERE sensor_id IN ({ids}) AND {where}
+        GROUP BY ts
+    '''
+
+def run_database_init():
+    """Subsistema de base de datos: reintenta init_database con espera exponencial
+    hasta que MySQL esté disponible, para que /readyz se recupere sin reiniciar.
+    """
+    delay = 1
+    while not init_database():
+        print(f"Reintentando inicializar la base de datos en {delay:.0f}s...")
+        time.sleep(delay)
+        delay = min(delay * 2, DB_INIT_RETRY_MAX)
+
+def get_spool_checkpoint() -> int | None:
+    """Último número de secuencia del spool cargado en sensor_readings"""
+    conn = get_connection()
+    if not conn:
+        return None
+    try:
+        cursor = conn.cursor()
+        cursor.execute('SELECT last_seq FROM spool_checkpoint WHERE id = 1')
+        result = cursor.fetchone()
+        cursor.close()
+        conn.close()
+        return result[0] if result else 0
+    except _mysql().Error as e:
+        print(f"Error obteniendo checkpoint del spool: {e}")
+        return None
+
+def save_sensor_readings_batch(rows: list, last_seq: int) -> bool:
+    """Inserta un lote de lecturas (timestamp, valores en orden de SENSORS) y avanza
+    el checkpoint del spool en la misma transacción, de modo que reintentar es idempotente.
+    """
     conn = get_connection()
     if not conn:
         return False
     try:
+        columns = [sensor['column'] for sensor in SENSORS]
         cursor = conn.cursor()
+        if storage_layout == 'long':
+            # Solo los sensores presentes: sin NULLs por sensores que no reportaron
+            ids_by_column = get_sensor_ids()
+            samples = [
+                (ids_by_column[column], row[0], value)
+                for row in rows
+                for column, value in zip(columns, row[1:])
+                if value is not None
+            ]
+            cursor.executemany('''
+                INSERT INTO sensor_samples (sensor_id, ts, value) VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE value = VALUES(value)
+            ''', samples)
+        else:
+            placeholders = ', '.join(['%s'] * (len(columns) + 1))
+            cursor.executemany(f'''
+                INSERT INTO sensor_readings (timestamp, {', '.join(columns)})
+                VALUES ({placeholders})
+            ''', rows)
         cursor.execute('''
-            INSERT INTO sensor_readings 
-            (timestamp, temperatura, presion, humedad, humedad_suelo, luz, vibracion)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-        ''', (
-            timestamp,
-            readings.get('Temperatura'),
-            readings.get('Presión'),
-            readings.get('Humedad'),
-            readings.get('Humedad suelo'),
-            readings.get('Luz'),
-            readings.get('Vibración')
-        ))
+            INSERT INTO spool_checkpoint (id, last_seq) VALUES (1, %s)
+            ON DUPLICATE KEY UPDATE last_seq = VALUES(last_seq)
+        ''', (last_seq,))
         conn.commit()
         cursor.close()
         conn.close()
         return True
-    except Error as e:
-        print(f"Error guardando lectura: {e}")
+    except _mysql().Error as e:
+        print(f"Error guardando lote de lecturas: {e}")
         return False
 
 def get_readings_for_period(hours: int = 24) -> list:
@@ -146,17 +421,17 @@ def get_readings_for_period(hours: int = 24) -> list:
     if not conn:
         return []
     try:
+        columns = [sensor['column'] for sensor in SENSORS]
         cursor = conn.cursor(dictionary=True)
-        cursor.execute('''
-            SELECT * FROM sensor_readings 
-            WHERE timestamp >= DATE_SUB(NOW(), INTERVAL %s HOUR)
-            ORDER BY timestamp ASC
-        ''', (hours,))
+        cursor.execute(
+            readings_query(columns, "{ts} >= DATE_SUB(NOW(), INTERVAL %s HOUR)") + " ORDER BY timestamp ASC",
+            (hours,)
+        )
         results = cursor.fetchall()
         cursor.close()
         conn.close()
         return results
-    except Error as e:
+    except _mysql().Error as e:
         print(f"Error obteniendo lecturas: {e}")
         return []
 
@@ -165,10 +440,11 @@ def clear_old_readings(days: int = 7):
     if not conn:
         return False
     try:
+        table, ts = readings_table()
         cursor = conn.cursor()
-        cursor.execute('''
-            DELETE FROM sensor_readings 
-            WHERE timestamp < DATE_SUB(NOW(), INTERVAL %s DAY)
+        cursor.execute(f'''
+            DELETE FROM {table} 
+            WHERE {ts} < DATE_SUB(NOW(), INTERVAL %s DAY)
         ''', (days,))
         deleted = cursor.rowcount
         conn.commit()
@@ -176,31 +452,10 @@ def clear_old_readings(days: int = 7):
         conn.close()
         print(f"✅ {deleted} lecturas antiguas eliminadas")
         return True
-    except Error as e:
+    except _mysql().Error as e:
         print(f"Error limpiando lecturas: {e}")
         return False
 
-def clear_yesterday_readings():
-    """Elimina las lecturas del día anterior (para ejecutar a las 00:00)"""
-    conn = get_connection()
-    if not conn:
-        return False
-    try:
-        cursor = conn.cursor()
-        cursor.execute('''
-            DELETE FROM sensor_readings 
-            WHERE DATE(timestamp) = DATE_SUB(CURDATE(), INTERVAL 1 DAY)
-        ''')
-        deleted = cursor.rowcount
-        conn.commit()
-        cursor.close()
-        conn.close()
-        print(f"✅ {deleted} lecturas del día anterior eliminadas")
-        return True
-    except Error as e:
-        print(f"Error limpiando lecturas del día anterior: {e}")
-        return False
-
 def save_report(report_data: dict):
     conn = get_connection()
     if not conn:
@@ -225,7 +480,7 @@ def save_report(report_data: dict):
         conn.close()
         print(f"✅ Reporte guardado para {report_data.get('fecha')}")
         return True
-    except Error as e:
+    except _mysql().Error as e:
         print(f"Error guardando reporte: {e}")
         return False
 
@@ -242,10 +497,946 @@ def get_latest_report() -> dict | None:
         if result and result.get('full_report'):
             return json.loads(result['full_report'])
         return result
-    except Error as e:
+    except _mysql().Error as e:
         print(f"Error obteniendo último reporte: {e}")
         return None
 
+def get_hourly_aggregates(day: date) -> list | None:
+    """Agregados por hora (conteo, suma, mín, máx por sensor) de las lecturas de un día"""
+    conn = get_connection()
+    if not conn:
+        return None
+    try:
+        aggregates = ', '.join(
+            f"COUNT({c}) AS {c}_n, SUM({c}) AS {c}_sum, MIN({c}) AS {c}_min, MAX({c}) AS {c}_max"
+            for c in (sensor['column'] for sensor in SENSORS)
+        )
+        source = readings_query([sensor['column'] for sensor in SENSORS], "{ts} >= %s AND {ts} < %s")
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute(f'''
+            SELECT HOUR(timestamp) AS hora, COUNT(*) AS lecturas,
+                   MIN(timestamp) AS inicio, MAX(timestamp) AS fin, {aggregates}
+            FROM ({source}) AS readings
+            GROUP BY HOUR(timestamp)
+            ORDER BY hora ASC
+        ''', (day, day + timedelta(days=1)))
+        results = cursor.fetchall()
+        cursor.close()
+        conn.close()
+        return results
+    except _mysql().Error as e:
+        print(f"Error obteniendo agregados diarios: {e}")
+        return None
+
+def get_cached_daily_summary(day: date) -> dict | None:
+    conn = get_connection()
+    if not conn:
+        return None
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute('SELECT data_hash, summary, analysis, final FROM daily_summaries WHERE fecha = %s', (day,))
+        result = cursor.fetchone()
+        cursor.close()
+        conn.close()
+        if not result:
+            return None
+        return {
+            'data_hash': result['data_hash'],
+            'summary': json.loads(result['summary']),
+            'analysis': json.loads(result['analysis']) if result['analysis'] else None,
+            'final': bool(result['final'])
+        }
+    except _mysql().Error as e:
+        print(f"Error obteniendo resumen diario: {e}")
+        return None
+
+def save_daily_summary(day: date, data_hash: str, summary: dict):
+    """Guarda el resumen provisional de un día en curso, conservando su análisis.
+
+    El análisis de un día sin cerrar solo lo escribe el informe diario (el último
+    generado), así que sigue siendo el del día aunque después lleguen más lecturas.
+    """
+    conn = get_connection()
+    if not conn:
+        return False
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO daily_summaries (fecha, data_hash, summary)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                data_hash = VALUES(data_hash),
+                summary = VALUES(summary)
+        ''', (day, data_hash, json.dumps(summary, ensure_ascii=False)))
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return True
+    except _mysql().Error as e:
+        print(f"Error guardando resumen diario: {e}")
+        return False
+
+def save_daily_analysis(day: date, data_hash: str, analysis: dict):
+    conn = get_connection()
+    if not conn:
+        return False
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            UPDATE daily_summaries SET analysis = %s
+            WHERE fecha = %s AND data_hash = %s
+        ''', (json.dumps(analysis, ensure_ascii=False), day, data_hash))
+        conn.commit()
+        cursor.close()
+        conn.close()
+        return True
+    except _mysql().Error as e:
+        print(f"Error guardando análisis diario: {e}")
+        return False
+
+def get_days_without_analysis(since: date) -> list:
+    conn = get_connection()
+    if not conn:
+        return []
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            SELECT fecha FROM daily_summaries
+            WHERE final = TRUE AND analysis IS NULL AND fecha >= %s
+            ORDER BY fecha ASC
+        ''', (since,))
+        days = [row[0] for row in cursor.fetchall()]
+        cursor.close()
+        conn.close()
+        return days
+    except _mysql().Error as e:
+        print(f"Error obteniendo días sin análisis: {e}")
+        return []
+
+def save_final_daily_summary(day: date, data_hash: str, summary: dict, analysis: dict | None):
+    """Guarda el resumen definitivo del día y elimina sus lecturas en la misma transacción"""
+    conn = get_connection()
+    if not conn:
+        return False
+    try:
+        table, ts = readings_table()
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO daily_summaries (fecha, data_hash, summary, analysis, final)
+            VALUES (%s, %s, %s, %s, TRUE)
+            ON DUPLICATE KEY UPDATE
+                data_hash = VALUES(data_hash),
+                summary = VALUES(summary),
+                analysis = VALUES(analysis),
+                final = TRUE
+        ''', (
+            day, data_hash, json.dumps(summary, ensure_ascii=False),
+            json.dumps(analysis, ensure_ascii=False) if analysis else None
+        ))
+        cursor.execute(f'DELETE FROM {table} WHERE {ts} >= %s AND {ts} < %s', (day, day + timedelta(days=1)))
+        deleted = cursor.rowcount
+        conn.commit()
+        cursor.close()
+        conn.close()
+        print(f"✅ Día {day} consolidado ({deleted} lecturas eliminadas)")
+        return True
+    except _mysql().Error as e:
+        print(f"Error consolidando el día {day}: {e}")
+        return False
+
+def get_period_report(period_key: str) -> dict | None:
+    conn = get_connection()
+    if not conn:
+        return None
+    try:
+        cursor = conn.cursor(dictionary=True)
+        cursor.execute('SELECT data_hash, full_report FROM period_reports WHERE period_key = %s', (period_key,))
+        result = cursor.fetchone()
+        cursor.close()
+        conn.close()
+        if not result:
+            return None
+        return {'data_hash': result['data_hash'], 'report': json.loads(result['full_report'])}
+    except _mysql().Error as e:
+        print(f"Error obteniendo reporte de período: {e}")
+        return None
+
+def save_period_report(period_key: str, data_hash: str, report_data: dict):
+    conn = get_connection()
+    if not conn:
+        return False
+    try:
+        cursor = conn.cursor()
+        cursor.execute('''
+            INSERT INTO period_reports (period_key, data_hash, full_report)
+            VALUES (%s, %s, %s)
+            ON DUPLICATE KEY UPDATE
+                data_hash = VALUES(data_hash),
+                full_report = VALUES(full_report)
+        ''', (period_key, data_hash, json.dumps(report_data, ensure_ascii=False)))
+        conn.commit()
+        cursor.close()
+        conn.close()
+        print(f"✅ Reporte de período guardado: {period_key}")
+        return True
+    except _mysql().Error as e:
+        print(f"Error guardando reporte de período: {e}")
+        return False
+
+# ==================== EXPORT ====================
+
+# formato -> (mimetype, extensión)
+EXPORT_FORMATS = {
+    'csv':     ('text/csv', 'csv'),
+    'ndjson':  ('application/x-ndjson', 'ndjson'),
+    'parquet': ('application/vnd.apache.parquet', 'parquet'),
+    'arrow':   ('application/vnd.apache.arrow.stream', 'arrows')
+}
+
+def parse_export_time(value: str | None, default: datetime) -> datetime:
+    """Convierte una fecha ISO a hora local GMT-5 sin zona, como se guarda en MySQL"""
+    if not value:
+        return default
+    ts = datetime.fromisoformat(value)
+    if ts.tzinfo:
+        ts = ts.astimezone(timezone(timedelta(hours=-5)))
+    return ts.replace(tzinfo=None)
+
+def resolve_export_columns(selection: str | None) -> list:
+    """Columnas de sensor_readings para una lista de sensores (id, columna o etiqueta)"""
+    if not selection:
+        return [sensor['column'] for sensor in SENSORS]
+    columns = []
+    for name in selection.split(','):
+        name = name.strip()
+        sensor = next((s for s in SENSORS if name in (s['id'], s['column'], s['label'])), None)
+        if not sensor:
+            raise ValueError(f"Sensor desconocido: {name}")
+        if sensor['column'] not in columns:
+            columns.append(sensor['column'])
+    return columns
+
+def iter_reading_batches(conn, start: datetime, end: datetime, columns: list):
+    """Lee sensor_readings en lotes de EXPORT_BATCH_ROWS con un cursor no bufferizado.
+
+    Cierra la conexión al terminar o si el consumidor abandona el generador.
+    """
+    cursor = conn.cursor(buffered=False)
+    try:
+        # Las columnas provienen de SENSORS (resolve_export_columns), no del usuario
+        cursor.execute(
+            readings_query(columns, "{ts} >= %s AND {ts} < %s") + " ORDER BY timestamp ASC",
+            (start, end)
+        )
+        while True:
+            rows = cursor.fetchmany(EXPORT_BATCH_ROWS)
+            if not rows:
+                break
+            yield rows
+    finally:
+        try:
+            cursor.close()
+        except _mysql().Error:
+            pass  # Exportación interrumpida con filas sin leer
+        conn.close()
+
+def _export_csv(batches, columns: list):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['timestamp'] + columns)
+    for rows in batches:
+        for ts, *values in rows:
+            writer.writerow([ts.isoformat()] + ['' if v is None else v for v in values])
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode()
+
+def _export_ndjson(batches, columns: list):
+    for rows in batches:
+        lines = []
+        for ts, *values in rows:
+            record = {'timestamp': ts.isoformat()}
+            for column, value in zip(columns, values):
+                record[column] = float(value) if value is not None else None
+            lines.append(json.dumps(record))
+        yield ('\n'.join(lines) + '\n').encode()
+
+class _ChunkSink:
+    """Archivo de solo escritura que acumula bytes hasta vaciarlos con drain()"""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+        self.closed = False
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def _export_arrow(batches, columns: list, fmt: str):
+    """Parquet (un row group por lote) o Arrow IPC stream, escritos por lotes de columnas"""
+    pa = _pyarrow()
+    schema = pa.schema(
+        [('timestamp', pa.timestamp('s'))] + [(column, pa.float64()) for column in columns]
+    )
+    sink = _ChunkSink()
+    native = pa.PythonFile(sink, mode='w')
+    if fmt == 'parquet':
+        writer = pa.parquet.ParquetWriter(native, schema, compression='zstd')
+    else:
+        writer = pa.ipc.new_stream(native, schema)
+
+    for rows in batches:
+        arrays = [pa.array([row[0] for row in rows], type=pa.timestamp('s'))]
+        for i in range(1, len(columns) + 1):
+            arrays.append(pa.array(
+                [float(row[i]) if row[i] is not None else None for row in rows],
+                type=pa.float64()
+            ))
+        writer.write_batch(pa.record_batch(arrays, schema=schema))
+        yield sink.drain()
+
+    writer.close()
+    yield sink.drain()
+
+def generate_export(conn, fmt: str, start: datetime, end: datetime, columns: list):
+    batches = iter_reading_batches(conn, start, end, columns)
+    if fmt == 'csv':
+        return _export_csv(batches, columns)
+    if fmt == 'ndjson':
+        return _export_ndjson(batches, columns)
+    return _export_arrow(batches, columns, fmt)
+
+_export_builds = {}
+_export_build_errors = {}
+_export_builds_lock = threading.Lock()
+
+def _cleanup_export_cache():
+    limit = time.time() - EXPORT_CACHE_HOURS * 3600
+    with _export_builds_lock:
+        building = set(_export_builds)
+    for path in EXPORT_DIR.glob('*'):
+        # Los .tmp de exportaciones en curso se nombran <key>.<hilo>.tmp
+        if path.suffix == '.tmp' and path.name.split('.')[0] in building:
+            continue
+        try:
+            if path.stat().st_mtime < limit:
+                path.unlink(missing_ok=True)
+        except FileNotFoundError:
+            pass  # Eliminado o reemplazado por otra petición durante el recorrido
+
+def _build_export_file(key: str, fmt: str, start: datetime, end: datetime, columns: list):
+    """Escribe la exportación en disco junto a <key>.etag con el sha256 de su contenido"""
+    path = EXPORT_DIR / f"{key}.{EXPORT_FORMATS[fmt][1]}"
+    tmp_path = EXPORT_DIR / f"{key}.{threading.get_ident()}.tmp"
+    conn = get_connection()
+    if not conn:
+        return
+    try:
+        digest = hashlib.sha256()
+        size = 0
+        with open(tmp_path, 'wb') as f:
+            batches = generate_export(conn, fmt, start, end, columns)
+            for chunk in batches:
+                size += len(chunk)
+                if size > EXPORT_MAX_BYTES:
+                    batches.close()
+                    raise ValueError(
+                        f"La exportación supera {EXPORT_MAX_BYTES} bytes; usa un rango menor "
+                        "o la descarga sin Range"
+                    )
+                digest.update(chunk)
+                f.write(chunk)
+        # El ETag se escribe antes de publicar el archivo de datos
+        (EXPORT_DIR / f"{key}.etag").write_text(digest.hexdigest())
+        os.replace(tmp_path, path)
+        print(f"✅ Exportación {path.name} generada")
+        _enforce_export_quota(path)
+    except ValueError as e:
+        # Se informa en la siguiente petición en lugar de volver a generarla
+        print(f"Exportación descartada: {e}")
+        tmp_path.unlink(missing_ok=True)
+        with _export_builds_lock:
+            _export_build_errors[key] = e
+    except (OSError, _mysql().Error) as e:
+        print(f"Error generando exportación: {e}")
+        tmp_path.unlink(missing_ok=True)
+    finally:
+        with _export_builds_lock:
+            _export_builds.pop(key, None)
+
+def _enforce_export_quota(keep: Path):
+    """Elimina las exportaciones usadas hace más tiempo hasta volver a EXPORT_MAX_BYTES"""
+    files = []
+    for path in EXPORT_DIR.glob('*'):
+        if path.suffix in ('.tmp', '.etag') or path == keep:
+            continue
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+    total = keep.stat().st_size + sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= EXPORT_MAX_BYTES:
+            break
+        path.unlink(missing_ok=True)
+        (EXPORT_DIR / f"{path.stem}.etag").unlink(missing_ok=True)
+        total -= size
+        print(f"⚠️ Caché de exportaciones llena: eliminado {path.name}")
+
+def get_export_file(key: str, fmt: str, start: datetime, end: datetime, columns: list) -> tuple | None:
+    """(ruta, etag) de una exportación materializada para servirla con soporte de Range.
+
+    Si aún no existe se genera en segundo plano y se devuelve None, para no
+    bloquear la petición mientras se escribe una exportación grande. Lanza
+    RuntimeError si ya hay EXPORT_MAX_BUILDS generaciones en curso y ValueError
+    si la generación anterior de la misma exportación superó EXPORT_MAX_BYTES.
+    """
+    EXPORT_DIR.mkdir(parents=True, exist_ok=True)
+    _cleanup_export_cache()
+
+    path = EXPORT_DIR / f"{key}.{EXPORT_FORMATS[fmt][1]}"
+    etag_path = EXPORT_DIR / f"{key}.etag"
+    if path.exists() and etag_path.exists():
+        try:
+            # La fecha de modificación marca el último uso (caducidad y desalojo LRU)
+            os.utime(path)
+            os.utime(etag_path)
+            return path, etag_path.read_text()
+        except FileNotFoundError:
+            pass  # Desalojado entre la comprobación y la lectura: se vuelve a generar
+
+    with _export_builds_lock:
+        error = _export_build_errors.pop(key, None)
+        if error:
+            raise ValueError(str(error))
+        if key not in _export_builds:
+            if len(_export_builds) >= EXPORT_MAX_BUILDS:
+                raise RuntimeError("Demasiadas exportaciones generándose; inténtalo más tarde")
+            thread = threading.Thread(
+                target=_build_export_file, args=(key, fmt, start, end, columns), daemon=True
+            )
+            _export_builds[key] = thread
+            thread.start()
+    return None
+
+# ==================== SENSOR HEALTH ====================
+# Estado O(1) por sensor actualizado con cada mensaje MQTT. La ventana de
+# medición se reinicia tras el informe diario programado.
+
+_health_lock = threading.Lock()
+sensor_health = {}
+health_window_start = time.time()
+
+def _new_sensor_health() -> dict:
+    return {
+        'status': 'no_data',
+        'last_seen': None,
+        'last_value': None,
+        'samples': 0,
+        'invalid': 0,
+        'out_of_range': 0,
+        'stuck_samples': 0,
+        'stuck_run': 0,
+        'avg_interval': None,
+        'gap_count': 0,
+        'gap_seconds': 0.0,
+        'gaps': deque(maxlen=20)
+    }
+
+def reset_sensor_health():
+    """Reinicia contadores y ventana de medición de todos los sensores"""
+    global health_window_start
+    with _health_lock:
+        health_window_start = time.time()
+        for sensor in SENSORS:
+            sensor_health[sensor['id']] = _new_sensor_health()
+
+reset_sensor_health()
+
+def _stuck_threshold(sensor: dict) -> int | None:
+    return sensor.get('stuck_samples', SENSOR_STUCK_SAMPLES)
+
+def _sensor_status(sensor: dict, state: dict, now: float) -> str:
+    if state['last_seen'] is None:
+        return 'no_data'
+    if now - state['last_seen'] > SENSOR_GAP_SECONDS:
+        return 'stale'
+    threshold = _stuck_threshold(sensor)
+    if threshold is not None and state['stuck_run'] >= threshold:
+        return 'stuck'
+    low, high = sensor['range']
+    if not (low <= state['last_value'] <= high):
+        return 'out_of_range'
+    return 'ok'
+
+def _emit_sensor_status(sensor: dict, state: dict):
+    socketio.emit('sensor_status', {
+        'sensor_id': sensor['id'],
+        'label': sensor['label'],
+        'status': state['status'],
+        'last_seen': int(state['last_seen'] * 1000) if state['last_seen'] else None
+    })
+
+def _record_gap(state: dict, start: float, end: float):
+    state['gap_count'] += 1
+    state['gap_seconds'] += end - start
+    state['gaps'].append((start, end))
+
+def record_sensor_sample(sensor: dict, value: float | None, now: float | None = None):
+    """Actualiza la salud de un sensor con una nueva muestra (None = payload inválido)"""
+    now = now or time.time()
+    with _health_lock:
+        state = sensor_health[sensor['id']]
+        previous_status = state['status']
+        
+        if value is None:
+            state['invalid'] += 1
+            return
+        
+        last_seen = state['last_seen']
+        if last_seen is None:
+            # El silencio desde el inicio de la ventana hasta la primera muestra también es un hueco
+            if now - health_window_start > SENSOR_GAP_SECONDS:
+                _record_gap(state, health_window_start, now)
+        else:
+            interval = now - last_seen
+            if interval > SENSOR_GAP_SECONDS:
+                _record_gap(state, last_seen, now)
+            elif state['avg_interval'] is None:
+                state['avg_interval'] = interval
+            else:
+                # Media móvil exponencial del intervalo entre muestras
+                state['avg_interval'] += 0.1 * (interval - state['avg_interval'])
+        
+        if value == state['last_value']:
+            state['stuck_run'] += 1
+            threshold = _stuck_threshold(sensor)
+            if threshold is not None and state['stuck_run'] >= threshold:
+                state['stuck_samples'] += 1
+        else:
+            state['stuck_run'] = 0
+        
+        low, high = sensor['range']
+        if not (low <= value <= high):
+            state['out_of_range'] += 1
+        
+        state['samples'] += 1
+        state['last_seen'] = now
+        state['last_value'] = value
+        state['status'] = _sensor_status(sensor, state, now)
+        changed = state['status'] != previous_status
+    
+    if changed:
+        _emit_sensor_status(sensor, state)
+
+def check_sensor_staleness():
+    """Marca como inactivos los sensores que llevan más de SENSOR_GAP_SECONDS sin datos"""
+    now = time.time()
+    changed = []
+    with _health_lock:
+        for sensor in SENSORS:
+            state = sensor_health[sensor['id']]
+            status = _sensor_status(sensor, state, now)
+            if status != state['status']:
+                state['status'] = status
+                changed.append((sensor, state))
+    for sensor, state in changed:
+        print(f"⚠️ Sensor {sensor['label']}: {state['status']}")
+        _emit_sensor_status(sensor, state)
+
+def _sensor_coverage(state: dict, now: float) -> float:
+    """Fracción de la ventana de medición con datos (descontando huecos)"""
+    if state['last_seen'] is None:
+        return 0.0
+    window = max(now - health_window_start, 1e-9)
+    missing = state['gap_seconds']
+    if now - state['last_seen'] > SENSOR_GAP_SECONDS:
+        missing += now - state['last_seen']
+    return max(0.0, 1.0 - missing / window)
+
+def get_sensor_health() -> dict:
+    now = time.time()
+    sensors = {}
+    with _health_lock:
+        for sensor in SENSORS:
+            state = sensor_health[sensor['id']]
+            avg_interval = state['avg_interval']
+            sensors[sensor['id']] = {
+                'label': sensor['label'],
+                'topic': sensor['topic'],
+                'status': _sensor_status(sensor, state, now),
+                'last_seen': int(state['last_seen'] * 1000) if state['last_seen'] else None,
+                'last_value': state['last_value'],
+                'samples': state['samples'],
+                'invalid': state['invalid'],
+                'sample_rate_hz': round(1 / avg_interval, 4) if avg_interval else None,
+                'out_of_range': state['out_of_range'],
+                'stuck_samples': state['stuck_samples'],
+                'gap_count': state['gap_count'],
+                'gap_seconds': round(state['gap_seconds'], 1),
+                'gaps': [[int(a * 1000), int(b * 1000)] for a, b in state['gaps']],
+                'coverage': round(_sensor_coverage(state, now), 4)
+            }
+        window_start = health_window_start
+    return {
+        'window_start': int(window_start * 1000),
+        'window_hours': round((now - window_start) / 3600, 2),
+        'sensors': sensors
+    }
+
+def get_data_quality() -> dict:
+    """Calidad de datos medida en la ingesta, con la estructura de `calidad_datos` del informe"""
+    health = get_sensor_health()
+    sensors = health['sensors'].values()
+    
+    completeness = sum(s['coverage'] for s in sensors) / len(SENSORS) * 100
+    problematic = [
+        s['label'] for s in sensors
+        if s['status'] != 'ok' or s['coverage'] < 0.9 or s['out_of_range'] or s['stuck_samples'] or s['invalid']
+    ]
+    
+    if completeness >= 95 and not problematic:
+        reliability = 'alta'
+    elif completeness >= 80:
+        reliability = 'media'
+    else:
+        reliability = 'baja'
+    
+    return {
+        'completitud': f"{completeness:.1f}%",
+        'sensores_problematicos': problematic,
+        'confiabilidad': reliability,
+        'ventana_horas': health['window_hours'],
+        'detalle_sensores': {
+            s['label']: {
+                'estado': s['status'],
+                'muestras': s['samples'],
+                'invalidas': s['invalid'],
+                'fuera_de_rango': s['out_of_range'],
+                'valores_atascados': s['stuck_samples'],
+                'huecos': s['gap_count'],
+                'segundos_sin_datos': s['gap_seconds'],
+                'cobertura': f"{s['coverage'] * 100:.1f}%",
+                'frecuencia_hz': s['sample_rate_hz']
+            }
+            for s in sensors
+        }
+    }
+
+def format_data_quality_for_llm(quality: dict) -> str:
+    lines = [
+        f"Completitud: {quality['completitud']} (ventana de {quality['ventana_horas']} h)",
+        f"Confiabilidad: {quality['confiabilidad']}"
+    ]
+    for label, detail in quality['detalle_sensores'].items():
+        lines.append(
+            f"  {label}: estado {detail['estado']}, cobertura {detail['cobertura']}, "
+            f"{detail['muestras']} muestras, {detail['huecos']} huecos, "
+            f"{detail['fuera_de_rango']} fuera de rango, {detail['valores_atascados']} atascadas, "
+            f"{detail['invalidas']} inválidas"
+        )
+    return '\n'.join(lines)
+
+# ==================== SPOOL ====================
+# Las lecturas se añaden a segmentos binarios append-only en SPOOL_DIR antes de
+# llegar a MySQL. Cada segmento se llama <seq_base>.seg, empieza con una cabecera
+# (magic, versión, número de sensores) y contiene registros de tamaño fijo:
+# crc32, timestamp en ms, máscara de sensores presentes y un double por sensor.
+# El tamaño fijo permite leerlos con mmap por desplazamiento. El checkpoint de
+# lo ya cargado vive en MySQL (spool_checkpoint) y se actualiza en la misma
+# transacción que las filas, así que la carga es idempotente y ordenada.
+
+SPOOL_MAGIC = b'NBXSPL'
+SPOOL_VERSION = 1
+SPOOL_HEADER = struct.Struct('<6sBB')
+
+_spool_lock = threading.Lock()
+_spool_event = threading.Event()
+_spool_file = None
+_spool_next_seq = None
+# Mayor secuencia corrupta ya contada, para no recontarla en cada pasada
+_spool_last_corrupt_seq = -1
+
+spool_metrics = {
+    'appended': 0,
+    'replayed': 0,
+    'dropped': 0,
+    'corrupt': 0,
+    'checkpoint': None,
+    'last_replay_at': None,
+    'last_replay_rate': None,
+    'last_error': None
+}
+
+def _spool_record_struct(n_sensors: int) -> struct.Struct:
+    return struct.Struct(f'<IqH{n_sensors}d')
+
+def _spool_segments() -> list:
+    """Segmentos del spool como [(seq_base, path)] ordenados"""
+    return sorted((int(path.stem), path) for path in SPOOL_DIR.glob('*.seg'))
+
+def _segment_record_count(path: Path, record_size: int) -> int:
+    return max(0, path.stat().st_size - SPOOL_HEADER.size) // record_size
+
+def _open_segment(seq_base: int):
+    path = SPOOL_DIR / f"{seq_base:020d}.seg"
+    f = open(path, 'ab')
+    if f.tell() == 0:
+        f.write(SPOOL_HEADER.pack(SPOOL_MAGIC, SPOOL_VERSION, len(SENSORS)))
+        f.flush()
+        os.fsync(f.fileno())
+    return f
+
+def _open_spool():
+    """Abre el último segmento para añadir (llamar con _spool_lock tomado)"""
+    global _spool_file, _spool_next_seq
+    if _spool_file is not None:
+        return
+    SPOOL_DIR.mkdir(parents=True, exist_ok=True)
+    segments = _spool_segments()
+
+    if segments:
+        seq_base, path = segments[-1]
+        with open(path, 'rb') as f:
+            header = f.read(SPOOL_HEADER.size)
+        if len(header) < SPOOL_HEADER.size:
+            # Caída al escribir la cabecera: el segmento aún no tenía registros
+            os.truncate(path, 0)
+            _spool_next_seq = seq_base
+            _spool_file = _open_segment(seq_base)
+            return
+        magic, version, n_sensors = SPOOL_HEADER.unpack(header)
+        if magic != SPOOL_MAGIC or version != SPOOL_VERSION:
+            # Ilegible: se aparta para inspección y se empieza un segmento nuevo
+            path.rename(path.with_suffix('.corrupt'))
+            print(f"⚠️ Segmento de spool no reconocido apartado como {path.stem}.corrupt")
+            _spool_next_seq = seq_base
+            _spool_file = _open_segment(seq_base)
+            return
+        record_size = _spool_record_struct(n_sensors).size
+        count = _segment_record_count(path, record_size)
+        # Descartar un registro incompleto al final (escritura interrumpida)
+        if path.stat().st_size > SPOOL_HEADER.size:
+            os.truncate(path, SPOOL_HEADER.size + count * record_size)
+        _spool_next_seq = seq_base + count
+        if n_sensors != len(SENSORS) and count == 0:
+            path.unlink()
+        # Si cambió la lista de sensores se empieza un segmento con el nuevo formato
+        _spool_file = _open_segment(seq_base if n_sensors == len(SENSORS) else _spool_next_seq)
+    else:
+        # Secuencia basada en el reloj para que siga siendo creciente aunque
+        # se borre el directorio del spool
+        _spool_next_seq = time.time_ns() // 1000
+        _spool_file = _open_segment(_spool_next_seq)
+
+def _enforce_spool_limit():
+    """Elimina los segmentos más antiguos si el spool supera SPOOL_MAX_BYTES"""
+    segments = _spool_segments()
+    total = sum(path.stat().st_size for _, path in segments)
+    checkpoint = spool_metrics['checkpoint'] or 0
+    for i, (seq_base, path) in enumerate(segments[:-1]):
+        if total <= SPOOL_MAX_BYTES:
+            break
+        size = path.stat().st_size
+        # Solo cuentan como descartadas las lecturas aún no cargadas
+        dropped = max(0, segments[i + 1][0] - max(seq_base, checkpoint + 1))
+        path.unlink()
+        total -= size
+        spool_metrics['dropped'] += dropped
+        print(f"⚠️ Spool lleno: descartadas {dropped} lecturas del segmento {path.name}")
+
+def spool_append(timestamp: datetime, readings: dict) -> bool:
+    """Añade una lectura (etiqueta -> valor) al spool; devuelve False si no se pudo escribir"""
+    global _spool_file, _spool_next_seq
+    record = _spool_record_struct(len(SENSORS))
+    mask = 0
+    values = []
+    for i, sensor in enumerate(SENSORS):
+        value = readings.get(sensor['label'])
+        if value is not None:
+            mask |= 1 << i
+        values.append(float(value) if value is not None else 0.0)
+    body = record.pack(0, int(timestamp.timestamp() * 1000), mask, *values)[4:]
+
+    try:
+        with _spool_lock:
+            _open_spool()
+            if _spool_file.tell() >= SPOOL_SEGMENT_BYTES:
+                _spool_file.close()
+                _spool_file = _open_segment(_spool_next_seq)
+                _enforce_spool_limit()
+            _spool_file.write(struct.pack('<I', zlib.crc32(body)) + body)
+            _spool_file.flush()
+            os.fsync(_spool_file.fileno())
+            _spool_next_seq += 1
+            spool_metrics['appended'] += 1
+    except OSError as e:
+        print(f"Error escribiendo en el spool: {e}")
+        return False
+
+    _spool_event.set()
+    return True
+
+def iter_spool_records(after_seq: int, limit: int):
+    """Registros válidos con secuencia > after_seq como (seq, timestamp_ms, mask, valores)"""
+    global _spool_last_corrupt_seq
+    with _spool_lock:
+        # Solo registros ya escritos por completo
+        end_seq = _spool_next_seq
+    if end_seq is None:
+        return
+    segments = _spool_segments()
+    for i, (seq_base, path) in enumerate(segments):
+        next_base = segments[i + 1][0] if i + 1 < len(segments) else None
+        if next_base is not None and next_base <= after_seq + 1:
+            continue
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size <= SPOOL_HEADER.size:
+                continue
+            with mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ) as mm:
+                magic, version, n_sensors = SPOOL_HEADER.unpack_from(mm, 0)
+                if magic != SPOOL_MAGIC or version != SPOOL_VERSION:
+                    print(f"⚠️ Segmento de spool no reconocido: {path.name}")
+                    continue
+                record = _spool_record_struct(n_sensors)
+                count = (size - SPOOL_HEADER.size) // record.size
+                count = min(count, end_seq - seq_base)
+                for index in range(max(0, after_seq + 1 - seq_base), count):
+                    offset = SPOOL_HEADER.size + index * record.size
+                    crc, ts_ms, mask, *values = record.unpack_from(mm, offset)
+                    if crc != zlib.crc32(mm[offset + 4:offset + record.size]):
+                        with _spool_lock:
+                            if seq_base + index > _spool_last_corrupt_seq:
+                                _spool_last_corrupt_seq = seq_base + index
+                                spool_metrics['corrupt'] += 1
+                        continue
+                    yield seq_base + index, ts_ms, mask, values
+                    limit -= 1
+                    if limit <= 0:
+                        return
+
+def _prune_spool(checkpoint: int):
+    """Elimina los segmentos cerrados que ya están cargados por completo"""
+    segments = _spool_segments()
+    with _spool_lock:
+        for i, (seq_base, path) in enumerate(segments[:-1]):
+            if segments[i + 1][0] - 1 <= checkpoint:
+                path.unlink(missing_ok=True)
+
+def replay_spool() -> int:
+    """Carga en MySQL, por lotes y en orden, los registros del spool posteriores al checkpoint"""
+    checkpoint = get_spool_checkpoint()
+    if checkpoint is None:
+        return 0
+    with _spool_lock:
+        spool_metrics['checkpoint'] = checkpoint
+
+    tz = timezone(timedelta(hours=-5))
+    today = get_timestamp_gmt_minus_5().date()
+    late_days = set()
+    replayed = 0
+    started = time.perf_counter()
+    while True:
+        batch = list(iter_spool_records(checkpoint, SPOOL_REPLAY_BATCH))
+        if not batch:
+            break
+        rows = []
+        for seq, ts_ms, mask, values in batch:
+            timestamp = datetime.fromtimestamp(ts_ms / 1000, tz)
+            if timestamp.date() < today:
+                late_days.add(timestamp.date())
+            rows.append((timestamp, *(
+                values[i] if i < len(values) and mask & (1 << i) else None
+                for i in range(len(SENSORS))
+            )))
+        last_seq = batch[-1][0]
+        with _readings_lock:
+            saved = save_sensor_readings_batch(rows, last_seq)
+        if not saved:
+            break
+        checkpoint = last_seq
+        replayed += len(rows)
+        with _spool_lock:
+            spool_metrics['checkpoint'] = checkpoint
+            spool_metrics['replayed'] += len(rows)
+
+    if replayed:
+        elapsed = time.perf_counter() - started
+        with _spool_lock:
+            spool_metrics['last_replay_at'] = time.time()
+            spool_metrics['last_replay_rate'] = round(replayed / elapsed, 1) if elapsed else None
+        print(f"Datos guardados en MySQL: {replayed} lecturas desde el spool")
+    _prune_spool(checkpoint)
+    # Lecturas de días ya cerrados: se suman a su resumen en vez de quedar sueltas
+    for day in sorted(late_days):
+        consolidate_daily_readings(day)
+    return replayed
+
+def get_spool_status() -> dict:
+    segments = _spool_segments() if SPOOL_DIR.exists() else []
+    with _spool_lock:
+        next_seq = _spool_next_seq
+        metrics = dict(spool_metrics)
+    checkpoint = metrics['checkpoint']
+    depth = None
+    if next_seq is not None and checkpoint is not None:
+        first = segments[0][0] if segments else next_seq
+        depth = next_seq - max(checkpoint + 1, first)
+    return {
+        'depth': depth,
+        'segments': len(segments),
+        'bytes': sum(path.stat().st_size for _, path in segments),
+        'max_bytes': SPOOL_MAX_BYTES,
+        **metrics
+    }
+
+def run_spool_replayer():
+    print("Iniciando replayer del spool...")
+    try:
+        with _spool_lock:
+            _open_spool()
+    except OSError as e:
+        print(f"Error abriendo el spool: {e}")
+        set_subsystem_status('spool', 'error', str(e))
+        return
+    set_subsystem_status('spool', 'ready')
+
+    while True:
+        _spool_event.wait(SPOOL_REPLAY_INTERVAL)
+        _spool_event.clear()
+        # El subsistema de base de datos reintenta su inicialización; hasta que
+        # esté listo los registros permanecen en el spool
+        if subsystem_status['database']['status'] != 'ready':
+            continue
+        try:
+            replay_spool()
+            error = None
+        except (OSError, _mysql().Error) as e:
+            print(f"Error cargando el spool: {e}")
+            error = str(e)
+        with _spool_lock:
+            spool_metrics['last_error'] = error
+
 # ==================== MQTT LOGGER ====================
 
 last_values = {}
@@ -256,16 +1447,30 @@ def get_timestamp_gmt_minus_5():
     return datetime.now(tz)
 
 def on_connect(client, userdata, flags, rc, properties=None):
+    if getattr(rc, 'is_failure', False):
+        print(f"Error conectando al broker MQTT: {rc}")
+        set_subsystem_status('mqtt', 'error', str(rc))
+        return
     print("✅ Conectado al broker MQTT para logging")
     for sensor in SENSORS:
         client.subscribe(sensor['topic'])
+    set_subsystem_status('mqtt', 'ready')
+
+def on_disconnect(client, userdata, flags, rc, properties=None):
+    print(f"⚠️ Desconectado del broker MQTT: {rc}")
+    set_subsystem_status('mqtt', 'degraded', str(rc))
+
+def on_connect_fail(client, userdata):
+    print("⚠️ No se pudo conectar al broker MQTT, reintentando...")
+    set_subsystem_status('mqtt', 'error', 'Conexión al broker fallida')
 
 def on_message(client, userdata, msg):
     global new_data_received
+    sensor = next((s for s in SENSORS if s['topic'] == msg.topic), None)
     try:
         value = float(msg.payload.decode())
-        sensor = next((s for s in SENSORS if s['topic'] == msg.topic), None)
         if sensor:
+            record_sensor_sample(sensor, value)
             last_values[sensor['label']] = value
             new_data_received = True
             
@@ -279,7 +1484,8 @@ def on_message(client, userdata, msg):
                 'timestamp': int(time.time() * 1000)
             })
     except ValueError:
-        pass
+        if sensor:
+            record_sensor_sample(sensor, None)
 
 def save_mqtt_data():
     global new_data_received, last_values
@@ -295,72 +1501,59 @@ def save_mqtt_data():
         if value is not None:
             readings[sensor['label']] = value
     
-    if readings:
-        if save_sensor_reading(timestamp, readings):
-            print(f"Datos guardados en MySQL: {timestamp.strftime('%Y-%m-%d %H:%M:%S')}")
+    # Se escribe primero en el spool local; el replayer lo carga en MySQL
+    if readings and not spool_append(timestamp, readings):
+        return
     
     new_data_received = False
     last_values = {}
 
-def run_mqtt_logger():
-    print("Iniciando logger MQTT...")
-    
+def create_mqtt_client():
+    """Cliente MQTT configurado (websockets + TLS + credenciales), sin callbacks"""
+    mqtt = _mqtt()
     client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, transport="websockets")
-    client.on_connect = on_connect
-    client.on_message = on_message
     
     if MQTT_USER and MQTT_PASSWORD:
         client.username_pw_set(MQTT_USER, MQTT_PASSWORD)
     
     client.tls_set(tls_version=ssl.PROTOCOL_TLS)
+    return client
+
+def run_mqtt_logger():
+    print("Iniciando logger MQTT...")
+    set_subsystem_status('mqtt', 'starting')
     
     try:
-        client.connect(MQTT_HOST, MQTT_PORT, 60)
-        client.loop_start()
-        
-        print("Logger MQTT iniciado. Guardando datos cada 10 segundos")
+        client = create_mqtt_client()
+        client.on_connect = on_connect
+        client.on_connect_fail = on_connect_fail
+        client.on_disconnect = on_disconnect
+        client.on_message = on_message
         
-        while True:
-            time.sleep(10)
-            save_mqtt_data()
+        # Con connect_async el loop de paho reintenta la conexión (DNS, broker
+        # caído al arrancar) con espera exponencial, igual que tras una desconexión
+        client.reconnect_delay_set(min_delay=1, max_delay=MQTT_RECONNECT_MAX)
+        client.connect_async(MQTT_HOST, MQTT_PORT, 60)
+        client.loop_start()
     except Exception as e:
         print(f"Error en MQTT logger: {e}")
-
-# ==================== LLM ANALYSIS ====================
-
-def format_readings_for_llm(readings: list) -> str:
-    if not readings:
-        return ""
+        set_subsystem_status('mqtt', 'error', str(e))
+        return
     
-    output_lines = []
-    for reading in readings:
-        ts = reading['timestamp']
-        if isinstance(ts, datetime):
-            ts_str = ts.strftime('%Y-%m-%dT%H:%M:%S-05:00')
-        else:
-            ts_str = str(ts)
-        
-        line = f"{ts_str}:\n"
-        if reading.get('temperatura') is not None:
-            line += f"  Temperatura: {reading['temperatura']} °C\n"
-        if reading.get('presion') is not None:
-            line += f"  Presión: {reading['presion']} hPa\n"
-        if reading.get('humedad') is not None:
-            line += f"  Humedad: {reading['humedad']} %\n"
-        if reading.get('humedad_suelo') is not None:
-            line += f"  Humedad suelo: {reading['humedad_suelo']} %\n"
-        if reading.get('luz') is not None:
-            line += f"  Luz: {reading['luz']} lux\n"
-        if reading.get('vibracion') is not None:
-            line += f"  Vibración: {reading['vibracion']} Hz\n"
-        output_lines.append(line)
+    print("Logger MQTT iniciado. Guardando datos cada 10 segundos")
     
-    return '\n'.join(output_lines)
+    # El guardado y la vigilancia de sensores siguen aunque el broker no esté conectado
+    while True:
+        time.sleep(10)
+        try:
+            save_mqtt_data()
+            check_sensor_staleness()
+        except Exception as e:
+            print(f"Error en MQTT logger: {e}")
 
-def analyze_data_with_llm(data: str) -> dict | None:
-    print("Enviando datos al LLM para análisis...")
-    
-    system_prompt = '''Eres un meteorólogo experto y científico de datos ambientales con 20 años de experiencia.
+# ==================== LLM ANALYSIS ====================
+
+LLM_SYSTEM_PROMPT = '''Eres un meteorólogo experto y científico de datos ambientales con 20 años de experiencia.
 Tu rol es analizar datos de sensores IoT y generar informes profesionales, detallados y accionables.
 
 Características de tu análisis:
@@ -373,16 +1566,8 @@ Características de tu análisis:
 
 Siempre respondes en JSON válido, sin markdown ni texto adicional.'''
 
-    prompt = f'''Analiza exhaustivamente los siguientes datos de sensores IoT recopilados en las últimas horas.
-
-## DATOS DE SENSORES
-{data}
-
-## INSTRUCCIONES DE ANÁLISIS
-
-Genera un informe JSON completo con la siguiente estructura:
-
-{{
+# Estructura del informe (diario y por períodos) solicitada al LLM
+REPORT_JSON_STRUCTURE = '''{
     "fecha": "YYYY-MM-DD",
     "hora_inicio": "HH:MM",
     "hora_fin": "HH:MM", 
@@ -393,44 +1578,44 @@ Genera un informe JSON completo con la siguiente estructura:
     
     "condicion_general": "Una de: Óptimo | Estable | Variable | Alerta | Crítico",
     
-    "indice_confort": {{
+    "indice_confort": {
         "valor": número del 1-100,
         "descripcion": "Interpretación del índice basado en temperatura y humedad"
-    }},
+    },
     
-    "variables": {{
-        "temperatura": {{
+    "variables": {
+        "temperatura": {
             "promedio": número,
             "max": número,
             "min": número,
             "amplitud_termica": número,
             "tendencia": "en aumento | en descenso | estable | oscilante",
             "interpretacion": "Análisis breve de las condiciones térmicas"
-        }},
-        "presion": {{
+        },
+        "presion": {
             "promedio": número,
             "max": número,
             "min": número,
             "variacion": número,
             "tendencia": "en aumento | en descenso | estable",
             "pronostico": "Qué indica la presión sobre el clima próximo"
-        }},
-        "humedad_relativa": {{
+        },
+        "humedad_relativa": {
             "promedio": número,
             "max": número,
             "min": número,
             "tendencia": "en aumento | en descenso | estable",
             "riesgo_rocio": "alto | medio | bajo | nulo",
             "interpretacion": "Análisis de las condiciones de humedad"
-        }},
-        "luminosidad": {{
+        },
+        "luminosidad": {
             "promedio": número,
             "max": número,
             "min": número,
             "horas_luz_optima": "Estimación de horas con luz adecuada",
             "tendencia": "Descripción del ciclo lumínico observado"
-        }},
-        "humedad_suelo": {{
+        },
+        "humedad_suelo": {
             "promedio": número,
             "max": número,
             "min": número,
@@ -438,36 +1623,36 @@ Genera un informe JSON completo con la siguiente estructura:
             "estado": "saturado | óptimo | seco | muy seco",
             "necesita_riego": true/false,
             "interpretacion": "Análisis del estado hídrico del suelo"
-        }},
-        "vibracion": {{
+        },
+        "vibracion": {
             "promedio": número o null,
             "max": número o null,
             "eventos_detectados": número,
             "interpretacion": "Análisis de actividad vibratoria si hay datos"
-        }}
-    }},
+        }
+    },
     
     "correlaciones": [
         "Descripción de relaciones observadas entre variables"
     ],
     
     "anomalias": [
-        {{
+        {
             "hora": "HH:MM",
             "tipo": "tipo de anomalía",
             "variable": "variable afectada",
             "descripcion": "Descripción detallada",
             "severidad": "baja | media | alta",
             "posible_causa": "Explicación probable"
-        }}
+        }
     ],
     
     "alertas": [
-        {{
+        {
             "tipo": "tipo de alerta",
             "mensaje": "Descripción de la alerta",
             "accion_recomendada": "Qué hacer al respecto"
-        }}
+        }
     ],
     
     "recomendaciones": [
@@ -478,23 +1663,74 @@ Genera un informe JSON completo con la siguiente estructura:
     
     "observaciones": "Interpretación final profesional de 2-3 párrafos sobre las condiciones generales, tendencias observadas, y pronóstico a corto plazo basado en los patrones detectados.",
     
-    "calidad_datos": {{
+    "calidad_datos": {
         "completitud": "porcentaje estimado de datos válidos",
         "sensores_problematicos": ["lista de sensores con lecturas sospechosas si los hay"],
         "confiabilidad": "alta | media | baja"
-    }}
-}}
+    }
+}'''
+
+def format_readings_for_llm(readings: list) -> str:
+    if not readings:
+        return ""
+    
+    output_lines = []
+    for reading in readings:
+        ts = reading['timestamp']
+        if isinstance(ts, datetime):
+            ts_str = ts.strftime('%Y-%m-%dT%H:%M:%S-05:00')
+        else:
+            ts_str = str(ts)
+        
+        line = f"{ts_str}:\n"
+        if reading.get('temperatura') is not None:
+            line += f"  Temperatura: {reading['temperatura']} °C\n"
+        if reading.get('presion') is not None:
+            line += f"  Presión: {reading['presion']} hPa\n"
+        if reading.get('humedad') is not None:
+            line += f"  Humedad: {reading['humedad']} %\n"
+        if reading.get('humedad_suelo') is not None:
+            line += f"  Humedad suelo: {reading['humedad_suelo']} %\n"
+        if reading.get('luz') is not None:
+            line += f"  Luz: {reading['luz']} lux\n"
+        if reading.get('vibracion') is not None:
+            line += f"  Vibración: {reading['vibracion']} Hz\n"
+        output_lines.append(line)
+    
+    return '\n'.join(output_lines)
+
+def analyze_data_with_llm(data: str, quality: str = "") -> dict | None:
+    print("Enviando datos al LLM para análisis...")
+
+    prompt = f'''Analiza exhaustivamente los siguientes datos de sensores IoT recopilados en las últimas horas.
+
+## DATOS DE SENSORES
+{data}
+
+## CALIDAD DE DATOS (medida en la ingesta)
+{quality or "No disponible"}
+
+## INSTRUCCIONES DE ANÁLISIS
+
+Genera un informe JSON completo con la siguiente estructura:
+
+{REPORT_JSON_STRUCTURE}
 
 IMPORTANTE: 
 - Calcula los valores estadísticos con precisión
 - Si un sensor no tiene datos, usa null y menciónalo
+- Para "calidad_datos" usa los valores medidos en la ingesta, no los estimes
 - Identifica al menos 2-3 correlaciones si existen patrones
 - Sé específico con las horas cuando menciones eventos
 - Las recomendaciones deben ser accionables y prácticas'''
 
+    return call_llm_json(LLM_SYSTEM_PROMPT, prompt)
+
+def call_llm_json(system_prompt: str, prompt: str, max_tokens: int = 4000) -> dict | None:
+    """Envía un prompt al LLM y devuelve la respuesta JSON parseada"""
     try:
         print("Enviando solicitud a la API de OpenAI...")
-        client = openai.OpenAI()
+        client = _openai().OpenAI()
         response = client.chat.completions.create(
             model="gpt-4o-mini",
             messages=[
@@ -502,7 +1738,7 @@ IMPORTANTE:
                 {"role": "user", "content": prompt}
             ],
             temperature=0.3,
-            max_tokens=4000
+            max_tokens=max_tokens
         )
         analysis_json = response.choices[0].message.content
         
@@ -527,6 +1763,23 @@ IMPORTANTE:
         print(f"Error al contactar o procesar la respuesta del LLM: {e}")
         return None
 
+def daily_analysis_from_report(report: dict) -> dict:
+    """Análisis del día (estructura de analyze_daily_summary_with_llm) a partir del informe diario"""
+    return {
+        'condicion_general': report.get('condicion_general'),
+        'resumen': report.get('resumen_ejecutivo'),
+        'tendencias': {
+            name: variable['tendencia']
+            for name, variable in (report.get('variables') or {}).items()
+            if isinstance(variable, dict) and variable.get('tendencia')
+        },
+        'anomalias': report.get('anomalias') or [],
+        'alertas': [
+            alert.get('mensaje') if isinstance(alert, dict) else alert
+            for alert in report.get('alertas') or []
+        ]
+    }
+
 def run_report_generation():
     print("\n--- Iniciando generación de informe ---")
     
@@ -542,23 +1795,467 @@ def run_report_generation():
         print("Error: No hay datos para analizar.")
         return None
 
-    analysis_result = analyze_data_with_llm(history_data)
+    quality = get_data_quality()
+    analysis_result = analyze_data_with_llm(history_data, format_data_quality_for_llm(quality))
     
     if not analysis_result:
         print("Error: No se pudo obtener el análisis del LLM.")
         return None
+    
+    # Las cifras de calidad son exactas; no se usa la estimación del LLM
+    analysis_result['calidad_datos'] = quality
 
     utc_minus_5 = datetime.utcnow() + timedelta(hours=-5)
     analysis_result['fecha'] = utc_minus_5.strftime('%Y-%m-%d')
     
     save_report(analysis_result)
     
+    # El informe queda también como análisis del día en daily_summaries, para
+    # que al cerrarlo a las 00:00 no se pida otro análisis al LLM
+    today = utc_minus_5.date()
+    entry = get_daily_summary(today)
+    if entry:
+        save_daily_analysis(today, entry['data_hash'], daily_analysis_from_report(analysis_result))
+    
     print("--- Generación de informe completada ---")
     
     send_daily_report_notification()
+
+    return analysis_result
+
+# ==================== STORAGE MIGRATION ====================
+
+def migrate_readings_to_long(batch_rows: int = MIGRATION_BATCH_ROWS, start_id: int = 0) -> int:
+    """Copia sensor_readings con id > start_id a sensor_samples en lotes ordenados por id.
+
+    Las inserciones son idempotentes, así que la migración puede repetirse sin
+    duplicar muestras. Tras cada lote se imprime el último id copiado; si se
+    interrumpe, se reanuda desde ahí con --from-id. Ejecutar con el servicio
+    detenido y luego arrancar con STORAGE_LAYOUT=long:
+    python app.py --migrate-storage [--from-id N]
+    """
+    if not init_database('long'):
+        return 0
+    conn = get_connection()
+    if not conn:
+        return 0
     
+    columns = [sensor['column'] for sensor in SENSORS]
+    migrated = 0
+    last_id = start_id
+    try:
+        cursor = conn.cursor()
+        while True:
+            cursor.execute(f'''
+                SELECT id, timestamp, {', '.join(columns)} FROM sensor_readings
+                WHERE id > %s ORDER BY id ASC LIMIT %s
+            ''', (last_id, batch_rows))
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            samples = [
+                (sensor_ids[column], ts, float(value))
+                for _, ts, *values in rows
+                for column, value in zip(columns, values)
+                if value is not None
+            ]
+            cursor.executemany('''
+                INSERT INTO sensor_samples (sensor_id, ts, value) VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE value = VALUES(value)
+            ''', samples)
+            conn.commit()
+            last_id = rows[-1][0]
+            migrated += len(rows)
+            print(f"  {migrated} lecturas migradas (último id {last_id})...")
+        cursor.close()
+        conn.close()
+        print(f"✅ Migración completada: {migrated} lecturas. Arranca con STORAGE_LAYOUT=long")
+        return migrated
+    except _mysql().Error as e:
+        print(f"Error migrando lecturas: {e}")
+        print(f"Para reanudar: python app.py --migrate-storage --from-id {last_id}")
+        return migrated
+
+# ==================== PERIOD REPORTS ====================
+# Los informes semanales, mensuales o de rango se construyen a partir de
+# resúmenes diarios compactos (agregados por hora) y análisis LLM por día,
+# cacheados en daily_summaries y asociados a un hash de los datos del día.
+# Un día sin cambios nunca se vuelve a analizar, y el informe del período
+# es una sola llamada al LLM sobre esos resúmenes. Al cerrar un día su
+# resumen queda como definitivo (final) y se eliminan sus lecturas crudas.
+
+# columna de sensor_readings -> clave en "variables" del informe
+REPORT_VARIABLES = {
+    'temperatura': 'temperatura',
+    'presion': 'presion',
+    'humedad': 'humedad_relativa',
+    'humedad_suelo': 'humedad_suelo',
+    'luz': 'luminosidad',
+    'vibracion': 'vibracion'
+}
+
+PERIOD_DAYS = {'weekly': 7, 'monthly': 30}
+# Límite de un período custom: cada día del rango es una consulta a la base de datos
+MAX_REPORT_DAYS = 366
+# El logger guarda una fila cada 10 segundos
+READINGS_PER_DAY = 24 * 3600 // 10
+
+def _to_float(value):
+    return float(value) if value is not None else None
+
+def build_daily_summary(day: date, hourly_rows: list) -> dict:
+    """Resumen compacto de un día a partir de sus agregados por hora"""
+    variables = {}
+    for sensor in SENSORS:
+        c = sensor['column']
+        rows = [row for row in hourly_rows if row[f'{c}_n']]
+        n = sum(row[f'{c}_n'] for row in rows)
+        total = sum(float(row[f'{c}_sum']) for row in rows)
+        variables[c] = {
+            'n': n,
+            'suma': round(total, 4),
+            'promedio': round(total / n, 2) if n else None,
+            'min': min(_to_float(row[f'{c}_min']) for row in rows) if rows else None,
+            'max': max(_to_float(row[f'{c}_max']) for row in rows) if rows else None,
+            # Promedio por hora: [hora, promedio, lecturas]
+            'horas': [
+                [row['hora'], round(float(row[f'{c}_sum']) / row[f'{c}_n'], 2), row[f'{c}_n']]
+                for row in rows
+            ]
+        }
+    return {
+        'fecha': day.isoformat(),
+        'lecturas': sum(row['lecturas'] for row in hourly_rows),
+        'hora_inicio': hourly_rows[0]['inicio'].strftime('%H:%M'),
+        'hora_fin': hourly_rows[-1]['fin'].strftime('%H:%M'),
+        'variables': variables
+    }
+
+def merge_daily_summaries(base: dict, late: dict) -> dict:
+    """Suma a un resumen definitivo las lecturas del mismo día que llegaron tarde"""
+    variables = {}
+    for sensor in SENSORS:
+        c = sensor['column']
+        old, new = base['variables'].get(c), late['variables'][c]
+        if not old or not old['n'] or not new['n']:
+            variables[c] = new if not old or not old['n'] else old
+            continue
+        n = old['n'] + new['n']
+        total = old['suma'] + new['suma']
+        hours = {entry[0]: entry for entry in old['horas']}
+        for hour, average, count in new['horas']:
+            previous = hours.get(hour)
+            if previous is None:
+                hours[hour] = [hour, average, count]
+            else:
+                hour_n = previous[2] + count
+                hours[hour] = [hour, round((previous[1] * previous[2] + average * count) / hour_n, 2), hour_n]
+        variables[c] = {
+            'n': n,
+            'suma': round(total, 4),
+            'promedio': round(total / n, 2),
+            'min': min(old['min'], new['min']),
+            'max': max(old['max'], new['max']),
+            'horas': [hours[hour] for hour in sorted(hours)]
+        }
+    return {
+        'fecha': base['fecha'],
+        'lecturas': base['lecturas'] + late['lecturas'],
+        'hora_inicio': min(base['hora_inicio'], late['hora_inicio']),
+        'hora_fin': max(base['hora_fin'], late['hora_fin']),
+        'variables': variables
+    }
+
+def _hash_hourly_rows(hourly_rows: list) -> str:
+    return hashlib.sha256(json.dumps(hourly_rows, default=str, sort_keys=True).encode()).hexdigest()
+
+def get_daily_summary(day: date) -> dict | None:
+    """Resumen del día con su hash y análisis cacheado.
+
+    Un día ya consolidado se devuelve tal cual: las lecturas que lleguen tarde se
+    suman a su resumen en consolidate_daily_readings. En otro caso se recalcula el
+    hash con las lecturas crudas y solo se regenera el resumen cuando cambió.
+    """
+    cached = get_cached_daily_summary(day)
+    if cached and cached['final']:
+        return cached
+    hourly_rows = get_hourly_aggregates(day)
+    if not hourly_rows:
+        return cached
+
+    data_hash = _hash_hourly_rows(hourly_rows)
+    if cached and cached['data_hash'] == data_hash:
+        return cached
+
+    summary = build_daily_summary(day, hourly_rows)
+    save_daily_summary(day, data_hash, summary)
+    return {'data_hash': data_hash, 'summary': summary, 'analysis': cached['analysis'] if cached else None, 'final': False}
+
+def consolidate_daily_readings(day: date) -> dict | None:
+    """Deja como definitivo el resumen de un día pasado y elimina sus lecturas crudas.
+
+    Si el día ya estaba consolidado, las lecturas que llegaron tarde (p. ej. al
+    vaciar el spool) se suman al resumen guardado en lugar de reemplazarlo.
+    """
+    with _readings_lock:
+        cached = get_cached_daily_summary(day)
+        hourly_rows = get_hourly_aggregates(day)
+        if not hourly_rows:
+            return cached
+
+        rows_hash = _hash_hourly_rows(hourly_rows)
+        summary = build_daily_summary(day, hourly_rows)
+        if cached and cached['final']:
+            summary = merge_daily_summaries(cached['summary'], summary)
+            data_hash = hashlib.sha256((cached['data_hash'] + rows_hash).encode()).hexdigest()
+            analysis = None
+        else:
+            data_hash = rows_hash
+            # El análisis del último informe diario sirve para el día cerrado
+            analysis = cached['analysis'] if cached else None
+
+        if not save_final_daily_summary(day, data_hash, summary, analysis):
+            return cached
+        return {'data_hash': data_hash, 'summary': summary, 'analysis': analysis, 'final': True}
+
+def format_daily_summary_for_llm(summary: dict, include_hours: bool = True) -> str:
+    lines = [f"{summary['fecha']} ({summary['lecturas']} lecturas, {summary['hora_inicio']}-{summary['hora_fin']}):"]
+    for sensor in SENSORS:
+        stats = summary['variables'].get(sensor['column'])
+        if not stats or not stats['n']:
+            lines.append(f"  {sensor['label']}: sin datos")
+            continue
+        lines.append(
+            f"  {sensor['label']}: promedio {stats['promedio']}, mín {stats['min']}, "
+            f"máx {stats['max']} {sensor['unit']} ({stats['n']} lecturas)"
+        )
+        if include_hours:
+            profile = ', '.join(f"{hour:02d}h {value}" for hour, value, _ in stats['horas'])
+            lines.append(f"    por hora: {profile}")
+    return '\n'.join(lines)
+
+def analyze_daily_summary_with_llm(summary: dict) -> dict | None:
+    print(f"Analizando resumen del día {summary['fecha']} con el LLM...")
+
+    prompt = f'''Analiza el siguiente resumen diario (agregados por hora) de sensores IoT.
+
+## RESUMEN DEL DÍA
+{format_daily_summary_for_llm(summary)}
+
+Responde con un JSON compacto con esta estructura:
+
+{{
+    "condicion_general": "Una de: Óptimo | Estable | Variable | Alerta | Crítico",
+    "resumen": "2-3 oraciones sobre las condiciones del día",
+    "tendencias": {{"variable": "en aumento | en descenso | estable | oscilante"}},
+    "anomalias": [
+        {{"hora": "HH:MM", "variable": "variable afectada", "descripcion": "Descripción breve", "severidad": "baja | media | alta"}}
+    ],
+    "alertas": ["Alerta breve si corresponde"]
+}}'''
+
+    return call_llm_json(LLM_SYSTEM_PROMPT, prompt, max_tokens=1000)
+
+def get_daily_analysis(day: date, entry: dict) -> dict | None:
+    """Análisis LLM del día, reutilizando el cacheado si los datos no cambiaron"""
+    if entry['analysis']:
+        return entry['analysis']
+    analysis = analyze_daily_summary_with_llm(entry['summary'])
+    if analysis:
+        save_daily_analysis(day, entry['data_hash'], analysis)
+        entry['analysis'] = analysis
+    return analysis
+
+def combine_daily_summaries(summaries: list) -> dict:
+    """Estadísticas exactas del período combinando conteos, sumas, mínimos y máximos diarios"""
+    variables = {}
+    for sensor in SENSORS:
+        c = sensor['column']
+        days = [s['variables'][c] for s in summaries if s['variables'].get(c, {}).get('n')]
+        n = sum(d['n'] for d in days)
+        total = sum(d['suma'] for d in days)
+        variables[c] = {
+            'n': n,
+            'promedio': round(total / n, 2) if n else None,
+            'min': min(d['min'] for d in days) if days else None,
+            'max': max(d['max'] for d in days) if days else None
+        }
+    return {
+        'lecturas': sum(s['lecturas'] for s in summaries),
+        'variables': variables
+    }
+
+def build_period_data_quality(totals: dict, days: int, days_with_data: int) -> dict:
+    """`calidad_datos` del período: muestras por sensor frente a las esperadas en todos sus días"""
+    expected = days * READINGS_PER_DAY
+    coverage = {
+        sensor['label']: min(totals['variables'][sensor['column']]['n'] / expected, 1.0)
+        for sensor in SENSORS
+    }
+    completeness = sum(coverage.values()) / len(SENSORS) * 100
+    problematic = [label for label, value in coverage.items() if value < 0.9]
+
+    if completeness >= 95 and not problematic:
+        reliability = 'alta'
+    elif completeness >= 80:
+        reliability = 'media'
+    else:
+        reliability = 'baja'
+
+    return {
+        'completitud': f"{completeness:.1f}%",
+        'sensores_problematicos': problematic,
+        'confiabilidad': reliability,
+        'sensores_sin_datos': [label for label, value in coverage.items() if not value],
+        'dias_con_datos': f"{days_with_data} de {days}",
+        'detalle_sensores': {
+            sensor['label']: {
+                'muestras': totals['variables'][sensor['column']]['n'],
+                'esperadas': expected,
+                'cobertura': f"{coverage[sensor['label']] * 100:.1f}%"
+            }
+            for sensor in SENSORS
+        }
+    }
+
+def resolve_report_period(period: str, start: str | None = None, end: str | None = None) -> tuple:
+    """Fechas (inicio, fin) inclusivas de un informe weekly | monthly | custom"""
+    end_date = date.fromisoformat(end) if end else get_timestamp_gmt_minus_5().date()
+    if period in PERIOD_DAYS:
+        return end_date - timedelta(days=PERIOD_DAYS[period] - 1), end_date
+    if period == 'custom':
+        if not start:
+            raise ValueError("Un período custom requiere start")
+        start_date = date.fromisoformat(start)
+        if start_date > end_date:
+            raise ValueError("start debe ser anterior o igual a end")
+        if (end_date - start_date).days + 1 > MAX_REPORT_DAYS:
+            raise ValueError(f"Un período custom no puede superar {MAX_REPORT_DAYS} días")
+        return start_date, end_date
+    raise ValueError(f"Período no soportado: {period}")
+
+def run_period_report_generation(period: str, start: date, end: date) -> dict | None:
+    print(f"\n--- Iniciando informe {period} ({start} a {end}) ---")
+
+    entries = []
+    day = start
+    while day <= end:
+        entry = get_daily_summary(day)
+        if entry:
+            entries.append((day, entry))
+        day += timedelta(days=1)
+
+    if not entries:
+        print("Error: No hay datos ni resúmenes diarios para el período.")
+        return None
+
+    period_key = f"{period}:{start.isoformat()}:{end.isoformat()}"
+    data_hash = hashlib.sha256('|'.join(entry['data_hash'] for _, entry in entries).encode()).hexdigest()
+
+    cached = get_period_report(period_key)
+    if cached and cached['data_hash'] == data_hash:
+        print("--- Datos sin cambios, se reutiliza el informe del período ---")
+        return cached['report']
+
+    # Solo análisis diarios ya cacheados: los que faltan los completa el scheduler,
+    # y las estadísticas exactas de cada día ya van en su resumen
+    daily_sections = []
+    for day, entry in entries:
+        analysis = entry['analysis']
+        section = format_daily_summary_for_llm(entry['summary'], include_hours=False)
+        if analysis:
+            section += f"\n  Análisis: {json.dumps(analysis, ensure_ascii=False)}"
+        daily_sections.append(section)
+
+    totals = combine_daily_summaries([entry['summary'] for _, entry in entries])
+    totals_lines = [f"Días con datos: {len(entries)} de {(end - start).days + 1}", f"Lecturas: {totals['lecturas']}"]
+    for sensor in SENSORS:
+        stats = totals['variables'][sensor['column']]
+        if stats['n']:
+            totals_lines.append(
+                f"{sensor['label']}: promedio {stats['promedio']}, mín {stats['min']}, máx {stats['max']} {sensor['unit']}"
+            )
+        else:
+            totals_lines.append(f"{sensor['label']}: sin datos")
+
+    quality = build_period_data_quality(totals, (end - start).days + 1, len(entries))
+    quality_lines = [
+        f"Completitud: {quality['completitud']} ({quality['dias_con_datos']} días con datos)",
+        f"Confiabilidad: {quality['confiabilidad']}"
+    ] + [
+        f"  {label}: {detail['muestras']} de {detail['esperadas']} muestras ({detail['cobertura']})"
+        for label, detail in quality['detalle_sensores'].items()
+    ]
+
+    nl = '\n'
+    prompt = f'''Genera un informe del período {start.isoformat()} a {end.isoformat()} a partir de los resúmenes diarios de sensores IoT.
+
+## ESTADÍSTICAS DEL PERÍODO (exactas)
+{nl.join(totals_lines)}
+
+## CALIDAD DE DATOS (calculada de los resúmenes)
+{nl.join(quality_lines)}
+
+## RESUMEN Y ANÁLISIS POR DÍA
+{(nl * 2).join(daily_sections)}
+
+## INSTRUCCIONES DE ANÁLISIS
+
+Genera un informe JSON completo con la siguiente estructura:
+
+{REPORT_JSON_STRUCTURE}
+
+IMPORTANTE:
+- Usa las estadísticas exactas del período, no las recalcules
+- Para "calidad_datos" usa los valores calculados, no los estimes
+- Las tendencias se refieren a la evolución entre días
+- En anomalías usa "YYYY-MM-DD HH:MM" como hora
+- Las recomendaciones deben ser accionables y prácticas'''
+
+    analysis_result = call_llm_json(LLM_SYSTEM_PROMPT, prompt)
+
+    if not analysis_result:
+        print("Error: No se pudo obtener el análisis del LLM.")
+        return None
+
+    # Sustituir las cifras del LLM por los agregados exactos
+    for column, key in REPORT_VARIABLES.items():
+        stats = totals['variables'][column]
+        variable = analysis_result.setdefault('variables', {}).setdefault(key, {})
+        variable.update({'promedio': stats['promedio'], 'max': stats['max'], 'min': stats['min']})
+    analysis_result['total_lecturas'] = totals['lecturas']
+    analysis_result['calidad_datos'] = quality
+    analysis_result['fecha'] = end.isoformat()
+    analysis_result['periodo'] = {
+        'tipo': period,
+        'inicio': start.isoformat(),
+        'fin': end.isoformat(),
+        'dias_con_datos': len(entries)
+    }
+
+    # Solo se cachea si todos los días tienen análisis
+    if all(entry['analysis'] for _, entry in entries):
+        save_period_report(period_key, data_hash, analysis_result)
+
+    print("--- Generación de informe del período completada ---")
+
     return analysis_result
 
+def cache_daily_summary(day: date):
+    """Consolida un día terminado (resumen definitivo, sin lecturas crudas) y cachea su análisis"""
+    entry = consolidate_daily_readings(day)
+    if entry:
+        get_daily_analysis(day, entry)
+        print(f"✅ Resumen diario cacheado para {day}")
+
+def analyze_pending_daily_summaries():
+    """Analiza los días consolidados sin análisis (nuevos o invalidados por lecturas tardías)"""
+    since = get_timestamp_gmt_minus_5().date() - timedelta(days=MAX_REPORT_DAYS)
+    for day in get_days_without_analysis(since):
+        entry = get_cached_daily_summary(day)
+        if entry:
+            get_daily_analysis(day, entry)
+
 # ==================== SCHEDULER ====================
 
 def get_current_time_gmt_minus_5():
@@ -575,6 +2272,8 @@ def run_scheduler():
     last_report_date = None
     last_cleanup_date = None
     
+    set_subsystem_status('scheduler', 'ready')
+    
     while True:
         now = get_current_time_gmt_minus_5()
         current_time = now.strftime("%H:%M")
@@ -583,54 +2282,190 @@ def run_scheduler():
         # Generar informe a las 23:30
         if current_time == target_report_time and last_report_date != current_date:
             print(f"Ejecutando generación de informe programado ({current_time} GMT-5)")
-            run_report_generation()
             last_report_date = current_date
+            try:
+                run_report_generation()
+            except Exception as e:
+                # Una tarea fallida no debe detener el scheduler
+                print(f"Error en la generación de informe programada: {e}")
+            reset_sensor_health()
         
         # Limpiar lecturas del día anterior a las 00:00
         if current_time == target_cleanup_time and last_cleanup_date != current_date:
             print(f"Ejecutando limpieza de lecturas del día anterior ({current_time} GMT-5)")
-            clear_yesterday_readings()
             last_cleanup_date = current_date
+            try:
+                cache_daily_summary(current_date - timedelta(days=1))
+                analyze_pending_daily_summaries()
+            except Exception as e:
+                print(f"Error en la consolidación programada: {e}")
         
         time.sleep(30)
 
 # ==================== FLASK ROUTES ====================
 
-@app.route('/')
+@bp.route('/')
 def index():
     return send_file('index.html')
 
-@app.route('/report.html')
+@bp.route('/report.html')
 def report_page():
     return send_file('report.html')
 
-@app.route('/css/<path:filename>')
+@bp.route('/css/<path:filename>')
 def serve_css(filename):
     return send_from_directory('css', filename)
 
-@app.route('/js/<path:filename>')
+@bp.route('/js/<path:filename>')
 def serve_js(filename):
     return send_from_directory('js', filename)
 
-@app.route('/images/<path:filename>')
+@bp.route('/images/<path:filename>')
 def serve_images(filename):
     return send_from_directory('images', filename)
 
-@app.route('/sw.js')
+@bp.route('/sw.js')
 def serve_sw():
     response = send_file('sw.js')
     response.headers['Content-Type'] = 'application/javascript'
     response.headers['Service-Worker-Allowed'] = '/'
     return response
 
-@app.route('/manifest.json')
+@bp.route('/manifest.json')
 def serve_manifest():
     return send_file('manifest.json', mimetype='application/manifest+json')
 
-@app.route('/generate-report', methods=['POST'])
+@bp.route('/healthz', methods=['GET'])
+def healthz():
+    """Liveness: el proceso responde, sin importar el estado de los subsistemas"""
+    return jsonify({
+        "status": "ok",
+        "uptime": round(time.perf_counter() - PROCESS_START, 3)
+    })
+
+@bp.route('/readyz', methods=['GET'])
+def readyz():
+    """Readiness: 200 solo cuando base de datos, MQTT, scheduler y spool están listos"""
+    ready = is_ready()
+    with _status_lock:
+        subsystems = {name: dict(status) for name, status in subsystem_status.items()}
+    body = {
+        "status": "ready" if ready else "not_ready",
+        "subsystems": subsystems,
+        "import_time": round(IMPORT_TIME, 3),
+        "time_to_ready": round(time_to_ready, 3) if time_to_ready is not None else None
+    }
+    return jsonify(body), 200 if ready else 503
+
+@bp.route('/export', methods=['GET'])
+def handle_export():
+    """Exporta lecturas: ?start=ISO&end=ISO&sensors=temperatura,luz&format=csv|ndjson|parquet|arrow
+
+    Sin cabecera Range la respuesta se transmite por lotes y no es reanudable.
+    Con Range (p. ej. bytes=0- para iniciar una descarga reanudable) se requiere
+    un end explícito y no futuro; la exportación se materializa en disco en segundo plano
+    (503 + Retry-After mientras se genera, o si ya hay EXPORT_MAX_BUILDS en curso)
+    y se sirve con un ETag derivado de su contenido, de modo que If-Range no mezcla
+    bytes de exportaciones distintas. Una exportación mayor que EXPORT_MAX_BYTES
+    se rechaza con 400.
+    """
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in EXPORT_FORMATS:
+        return jsonify({"error": f"Formato no soportado: {fmt}"}), 400
+
+    try:
+        now = get_timestamp_gmt_minus_5().replace(tzinfo=None)
+        requested_end = parse_export_time(request.args.get('end'), now)
+        # No se exportan instantes futuros: su contenido aún puede cambiar
+        end = min(requested_end, now)
+        start = parse_export_time(request.args.get('start'), end - timedelta(hours=24))
+        columns = resolve_export_columns(request.args.get('sensors'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if start >= end:
+        return jsonify({"error": "start debe ser anterior a end"}), 400
+
+    if fmt in ('parquet', 'arrow'):
+        try:
+            _pyarrow()
+        except ImportError:
+            return jsonify({"error": "pyarrow no está instalado"}), 501
+
+    # En el layout 'long' la consulta necesita los sensor_id antes de empezar a transmitir
+    if storage_layout == 'long':
+        try:
+            get_sensor_ids()
+        except _mysql().Error as e:
+            return jsonify({"error": f"Base de datos no disponible: {e}"}), 503
+
+    mimetype, extension = EXPORT_FORMATS[fmt]
+    key = hashlib.sha256(
+        json.dumps([fmt, start.isoformat(), end.isoformat(), columns]).encode()
+    ).hexdigest()[:32]
+    filename = f"lecturas_{start:%Y%m%d_%H%M}_{end:%Y%m%d_%H%M}.{extension}"
+
+    if request.headers.get('Range'):
+        # Solo un intervalo cerrado en el pasado produce siempre el mismo contenido
+        if not request.args.get('end') or requested_end > now:
+            return jsonify({"error": "Las descargas reanudables (Range) requieren un end pasado"}), 400
+        try:
+            export = get_export_file(key, fmt, start, end, columns)
+        except RuntimeError as e:
+            return jsonify({"error": str(e)}), 503, {'Retry-After': '30'}
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        if not export:
+            return jsonify({"status": "building"}), 503, {'Retry-After': '5'}
+        path, etag = export
+        return send_file(path, mimetype=mimetype, as_attachment=True,
+                         download_name=filename, conditional=True, etag=etag)
+
+    conn = get_connection()
+    if not conn:
+        return jsonify({"error": "Base de datos no disponible"}), 503
+
+    response = Response(
+        stream_with_context(generate_export(conn, fmt, start, end, columns)),
+        mimetype=mimetype
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+@bp.route('/spool-status', methods=['GET'])
+def handle_spool_status():
+    return jsonify(get_spool_status())
+
+@bp.route('/sensor-health', methods=['GET'])
+def handle_sensor_health():
+    return jsonify(get_sensor_health())
+
+@socketio.on('connect')
+def handle_socket_connect():
+    # Estado inicial de los sensores para el cliente que se conecta
+    health = get_sensor_health()
+    for sensor_id, sensor in health['sensors'].items():
+        socketio.emit('sensor_status', {
+            'sensor_id': sensor_id,
+            'label': sensor['label'],
+            'status': sensor['status'],
+            'last_seen': sensor['last_seen']
+        }, to=request.sid)
+
+@bp.route('/generate-report', methods=['POST'])
 def handle_generate_report():
+    """Informe diario por defecto; {"period": "weekly|monthly|custom", "start", "end"} para períodos"""
     print("\n--- Petición recibida en /generate-report ---")
-    analysis_result = run_report_generation()
+    data = request.get_json(silent=True) or {}
+    period = data.get('period', 'daily')
+    
+    if period == 'daily':
+        analysis_result = run_report_generation()
+    else:
+        try:
+            start, end = resolve_report_period(period, data.get('start'), data.get('end'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        analysis_result = run_period_report_generation(period, start, end)
     
     if analysis_result:
         print("--- Proceso completado. Enviando informe al frontend. ---")
@@ -638,7 +2473,7 @@ def handle_generate_report():
     else:
         return jsonify({"error": "No se pudo generar el informe."}), 500
 
-@app.route('/latest-report', methods=['GET'])
+@bp.route('/latest-report', methods=['GET'])
 def handle_latest_report():
     report = get_latest_report()
     if report:
@@ -651,13 +2486,13 @@ def handle_latest_report():
 
 # ==================== PUSH NOTIFICATIONS ====================
 
-@app.route('/vapid-public-key', methods=['GET'])
+@bp.route('/vapid-public-key', methods=['GET'])
 def get_vapid_public_key():
     if not VAPID_PUBLIC_KEY:
         return jsonify({"error": "VAPID keys not configured"}), 500
     return jsonify({"publicKey": VAPID_PUBLIC_KEY})
 
-@app.route('/push-subscribe', methods=['POST'])
+@bp.route('/push-subscribe', methods=['POST'])
 def push_subscribe():
     subscription = request.get_json()
     if not subscription or 'endpoint' not in subscription:
@@ -668,7 +2503,7 @@ def push_subscribe():
     print(f"✅ Nueva suscripción push: {endpoint[:50]}...")
     return jsonify({"success": True, "message": "Subscribed successfully"})
 
-@app.route('/push-unsubscribe', methods=['POST'])
+@bp.route('/push-unsubscribe', methods=['POST'])
 def push_unsubscribe():
     data = request.get_json()
     endpoint = data.get('endpoint') if data else None
@@ -679,7 +2514,7 @@ def push_unsubscribe():
     
     return jsonify({"success": True})
 
-@app.route('/push-test', methods=['POST'])
+@bp.route('/push-test', methods=['POST'])
 def push_test():
     payload = json.dumps({
         "title": "🔔 Notificación de Prueba",
@@ -693,7 +2528,7 @@ def push_test():
     sent = send_push_to_all(payload)
     return jsonify({"success": True, "subscribers": len(push_subscriptions), "sent": sent})
 
-@app.route('/push-seismic-alert', methods=['POST'])
+@bp.route('/push-seismic-alert', methods=['POST'])
 def push_seismic_alert():
     data = request.get_json()
     magnitude = data.get('magnitude', 0) if data else 0
@@ -716,19 +2551,20 @@ def send_push_to_all(payload):
         print("⚠️ VAPID keys not configured, skipping push")
         return 0
     
+    pywebpush = _pywebpush()
     sent = 0
     failed_endpoints = []
     
     for endpoint, subscription in list(push_subscriptions.items()):
         try:
-            webpush(
+            pywebpush.webpush(
                 subscription_info=subscription,
                 data=payload,
                 vapid_private_key=VAPID_PRIVATE_KEY,
                 vapid_claims=VAPID_CLAIMS
             )
             sent += 1
-        except WebPushException as e:
+        except pywebpush.WebPushException as e:
             print(f"Error enviando push a {endpoint[:30]}...: {e}")
             if e.response and e.response.status_code in [404, 410]:
                 failed_endpoints.append(endpoint)
@@ -768,31 +2604,40 @@ def send_daily_report_notification():
 
 # ==================== MAIN ====================
 
-def start_background_services():
-    """Inicia los servicios en segundo plano"""
-    # Logger MQTT
-    mqtt_thread = threading.Thread(target=run_mqtt_logger, daemon=True)
-    mqtt_thread.start()
-    
-    # Scheduler
-    scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
-    scheduler_thread.start()
+def init_subsystems():
+    """Inicializa base de datos, logger MQTT, scheduler y spool en paralelo.
+
+    No bloquea: el estado de cada subsistema se consulta en /readyz.
+    """
+    for target in (run_database_init, run_mqtt_logger, run_scheduler, run_spool_replayer):
+        threading.Thread(target=target, daemon=True).start()
     
-    print("✅ Servicios en segundo plano iniciados")
+    print("✅ Inicialización de subsistemas en curso")
+
+# Tiempo de importación del módulo (sin openai, pywebpush, mysql ni paho)
+IMPORT_TIME = time.perf_counter() - PROCESS_START
 
 if __name__ == '__main__':
+    try:
+        validate_storage_config()
+    except ValueError as e:
+        print(f"Error de configuración: {e}")
+        sys.exit(1)
+    
+    if '--migrate-storage' in sys.argv:
+        start_id = int(sys.argv[sys.argv.index('--from-id') + 1]) if '--from-id' in sys.argv else 0
+        migrate_readings_to_long(start_id=start_id)
+        sys.exit(0)
+    
     print("=" * 50)
     print("Iniciando IoT Backend...")
     print("=" * 50)
+    print(f"Módulo importado en {IMPORT_TIME * 1000:.0f} ms")
     
-    # Inicializar base de datos
-    init_database()
-    
-    # Iniciar servicios en segundo plano
-    start_background_services()
+    app = create_app()
     
-    # Esperar un momento para que se conecte MQTT
-    time.sleep(2)
+    # Base de datos, MQTT y scheduler arrancan en paralelo; el servidor no los espera
+    init_subsystems()
     
     # Iniciar Flask con SocketIO
     print("Iniciando servidor Flask + WebSocket en http://0.0.0.0:5000")
@@ -0,0 +1,241 @@
+"""Benchmarks del backend IoT.
+
+Uso: python benchmark.py
+"""
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+
+IMPORT_RUNS = 5
+READY_TIMEOUT = 30
+
+# Lecturas sintéticas (una cada 10 s, como el logger MQTT) y consultas por sensor
+STORAGE_ROWS = 50_000
+STORAGE_BATCH = 5000
+STORAGE_QUERIES = 20
+
+
+def bench_import_time():
+    """Mide `import app` en un intérprete limpio (mediana de varias ejecuciones)"""
+    code = (
+        "import time; t = time.perf_counter(); import app; "
+        "print(time.perf_counter() - t)"
+    )
+    samples = []
+    for _ in range(IMPORT_RUNS):
+        out = subprocess.run(
+            [sys.executable, '-c', code],
+            cwd=BASE_DIR, capture_output=True, text=True, check=True
+        )
+        samples.append(float(out.stdout.strip().splitlines()[-1]))
+    print(f"import app: mediana {statistics.median(samples) * 1000:.1f} ms "
+          f"(min {min(samples) * 1000:.1f} ms, {IMPORT_RUNS} ejecuciones)")
+
+
+@contextmanager
+def _bench_database(app):
+    """Apunta DB_CONFIG a un esquema <DB_NAME>_bench y lo elimina al terminar"""
+    database = app.DB_CONFIG['database']
+    app.DB_CONFIG['database'] = f"{database}_bench"
+    try:
+        yield
+    finally:
+        config_without_db = {k: v for k, v in app.DB_CONFIG.items() if k != 'database'}
+        try:
+            conn = app._mysql().connect(**config_without_db)
+            conn.cursor().execute(f"DROP DATABASE IF EXISTS {app.DB_CONFIG['database']}")
+            conn.close()
+        except app._mysql().Error as e:
+            print(f"  No se pudo eliminar el esquema de benchmark: {e}")
+        app.DB_CONFIG['database'] = database
+
+
+def bench_subsystem_init():
+    """Mide la inicialización de cada subsistema por separado, sin ingerir datos.
+
+    La base de datos se crea en un esquema temporal, el spool en un directorio
+    temporal y MQTT solo conecta y desconecta, sin suscribirse. El scheduler no
+    se inicia. Como en init_subsystems los subsistemas arrancan en paralelo, el
+    time-to-ready estimado es la importación más el subsistema más lento.
+    """
+    import app
+
+    timings = {}
+
+    t = time.perf_counter()
+    app.create_app()
+    timings['flask'] = time.perf_counter() - t
+
+    for name, loader in (('mysql', app._mysql), ('paho', app._mqtt),
+                         ('openai', app._openai), ('pywebpush', app._pywebpush)):
+        t = time.perf_counter()
+        loader()
+        timings[f'import {name}'] = time.perf_counter() - t
+
+    # Base de datos en un esquema temporal
+    with _bench_database(app):
+        t = time.perf_counter()
+        ready = app.init_database()
+        timings['database'] = time.perf_counter() - t if ready else None
+
+    # Spool en un directorio temporal
+    spool_dir = app.SPOOL_DIR
+    app.SPOOL_DIR = Path(tempfile.mkdtemp())
+    try:
+        t = time.perf_counter()
+        with app._spool_lock:
+            app._open_spool()
+        timings['spool'] = time.perf_counter() - t
+    finally:
+        with app._spool_lock:
+            app._spool_file.close()
+            app._spool_file = None
+            app._spool_next_seq = None
+        shutil.rmtree(app.SPOOL_DIR, ignore_errors=True)
+        app.SPOOL_DIR = spool_dir
+
+    # MQTT: conexión al broker sin suscripciones
+    connected = threading.Event()
+    client = app.create_mqtt_client()
+    client.on_connect = lambda *args: connected.set()
+    t = time.perf_counter()
+    try:
+        client.connect(app.MQTT_HOST, app.MQTT_PORT, 60)
+        client.loop_start()
+        timings['mqtt'] = time.perf_counter() - t if connected.wait(READY_TIMEOUT) else None
+    except Exception as e:
+        print(f"  mqtt: error ({e})")
+        timings['mqtt'] = None
+    finally:
+        client.loop_stop()
+        client.disconnect()
+
+    for name, seconds in timings.items():
+        print(f"  {name}: " + (f"{seconds * 1000:.0f} ms" if seconds is not None else "no disponible"))
+
+    subsystems = [timings[name] for name in ('database', 'mqtt', 'spool')]
+    if None in subsystems:
+        print("time-to-ready estimado: no disponible (algún subsistema no inició)")
+    else:
+        print(f"time-to-ready estimado: {(app.IMPORT_TIME + timings['flask'] + max(subsystems)) * 1000:.0f} ms")
+
+
+def _synthetic_readings():
+    rng = random.Random(42)
+    start = datetime(2024, 1, 1)
+    for i in range(STORAGE_ROWS):
+        values = [
+            round(rng.uniform(10, 35), 2),
+            round(rng.uniform(990, 1030), 2),
+            round(rng.uniform(30, 95), 2),
+            round(rng.uniform(10, 60), 2),
+            round(rng.uniform(0, 80000), 2),
+            round(rng.uniform(0, 5), 2)
+        ]
+        # ~10 % de sensores sin reportar en cada flush
+        yield (start + timedelta(seconds=10 * i), *(v if rng.random() > 0.1 else None for v in values))
+
+
+def _insert_batch(cursor, table, columns, batch):
+    if table == 'bench_wide':
+        placeholders = ', '.join(['%s'] * (len(columns) + 1))
+        cursor.executemany(
+            f"INSERT INTO {table} (timestamp, {', '.join(columns)}) VALUES ({placeholders})", batch
+        )
+    else:
+        cursor.executemany(f"INSERT INTO {table} (sensor_id, ts, value) VALUES (%s, %s, %s)", batch)
+
+
+def bench_storage():
+    """Tamaño en disco y lectura de un día de un sensor: esquema ancho vs largo"""
+    import app
+
+    with _bench_database(app):
+        if not app.init_database():
+            print("storage: MySQL no disponible, se omite")
+            return
+        _bench_storage_layouts(app, app.get_connection())
+
+
+def _bench_storage_layouts(app, conn):
+    columns = [sensor['column'] for sensor in app.SENSORS]
+    layouts = {
+        'bench_wide': ('ancho DECIMAL', app.sensor_readings_ddl('bench_wide')),
+        'bench_long_float': ('largo FLOAT', app.sensor_samples_ddl('bench_long_float', 'FLOAT', False)),
+        'bench_long_double': ('largo DOUBLE', app.sensor_samples_ddl('bench_long_double', 'DOUBLE', False)),
+        'bench_long_compressed': ('largo FLOAT comprimido', app.sensor_samples_ddl('bench_long_compressed', 'FLOAT', True))
+    }
+    column = 'humedad'
+    sensor_id = columns.index(column) + 1
+    days = max(STORAGE_ROWS * 10 // 86400, 1)
+    rng = random.Random(7)
+    ranges = []
+    for _ in range(STORAGE_QUERIES):
+        day = datetime(2024, 1, 1) + timedelta(days=rng.randrange(days))
+        ranges.append((day, day + timedelta(days=1)))
+
+    cursor = conn.cursor()
+    try:
+        print(f"storage ({STORAGE_ROWS} flushes, consulta de 1 día de '{column}'):")
+        for table, (name, ddl) in layouts.items():
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+            cursor.execute(ddl)
+
+            batch = []
+            for row in _synthetic_readings():
+                if table == 'bench_wide':
+                    batch.append(row)
+                else:
+                    batch.extend((i + 1, row[0], v) for i, v in enumerate(row[1:]) if v is not None)
+                if len(batch) >= STORAGE_BATCH:
+                    _insert_batch(cursor, table, columns, batch)
+                    batch = []
+            if batch:
+                _insert_batch(cursor, table, columns, batch)
+            conn.commit()
+
+            cursor.execute(f"ANALYZE TABLE {table}")
+            cursor.fetchall()
+            cursor.execute(
+                "SELECT data_length + index_length FROM information_schema.TABLES "
+                "WHERE table_schema = DATABASE() AND table_name = %s", (table,)
+            )
+            size = cursor.fetchone()[0]
+
+            if table == 'bench_wide':
+                query = (f"SELECT timestamp, {column} FROM {table} "
+                         f"WHERE timestamp >= %s AND timestamp < %s AND {column} IS NOT NULL")
+                params = list(ranges)
+            else:
+                query = f"SELECT ts, value FROM {table} WHERE sensor_id = %s AND ts >= %s AND ts < %s"
+                params = [(sensor_id, *r) for r in ranges]
+            samples = []
+            for p in params:
+                t = time.perf_counter()
+                cursor.execute(query, p)
+                cursor.fetchall()
+                samples.append(time.perf_counter() - t)
+
+            print(f"  {name}: {size / 1024 / 1024:.2f} MiB, "
+                  f"consulta mediana {statistics.median(samples) * 1000:.2f} ms")
+    finally:
+        for table in layouts:
+            cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor.close()
+        conn.close()
+
+
+if __name__ == '__main__':
+    bench_import_time()
+    bench_subsystem_init()
+    bench_storage()